@@ -17,6 +17,7 @@ Requirements:
 - keyboard
 - pyperclip
 - PIL (Pillow)
+- numpy
 
 Usage:
 1. Configure the settings below
@@ -25,18 +26,30 @@ Usage:
 4. The script will automatically do the rest
 5. Hold CAPS LOCK at any time to stop the script
 
+Run with --post-process to skip capturing and only rebuild the manifest and
+transparent images from what is already in raw_images/.
+
 Created by: tinytank800
 """
 
-import pyautogui
 import time
-import keyboard
-import pyperclip
 import os
+import sys
+import io
 import json
+import hashlib
+import queue
+import threading
+import numpy as np
 from pathlib import Path
 from PIL import Image
 from datetime import datetime
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+from content_index import pixel_hash, save_index, load_index, write_changes, build_gallery_index
+from capture_backends import DesktopBackend
+from png_optimizer import optimize_directory
+from derivatives import build_derivatives
 
 # =============================================================================
 # CONFIGURATION SETTINGS
@@ -46,12 +59,33 @@ from datetime import datetime
 PLAYER_NAME = "tinytank800"  #CHANGE ME - Your Minecraft username
 SCREENSHOT_REGION = (1208, 1410, 128, 128)  # (x, y, width, height) of screenshot region
 
+# Batch capture settings (only used together with ITEM_ID_SOURCE)
+BATCH_SIZE = 1           # Items per screenshot: 1 = one at a time, 9 = hotbar, 36 = full inventory
+BATCH_REGION = (1208, 946, 1280, 592)  # (x, y, width, height) covering the main inventory and hotbar
+SLOT_SIZE = (128, 128)   # (width, height) of one slot capture, same as SCREENSHOT_REGION
+SLOT_PITCH = (144, 144)  # Distance between neighbouring slots
+INVENTORY_ORIGIN = (0, 0)  # Top-left of inventory slot 9 (first main inventory slot) inside BATCH_REGION
+HOTBAR_ORIGIN = (0, 464)   # Top-left of hotbar slot 0 inside BATCH_REGION
+
 # File paths
 BASE_DIRECTORY = r"E:\moreBackups\Backups\MinecraftAllItemImages" #CHANGE ME - Main folder with the python script
 RAW_IMAGES_DIR = os.path.join(BASE_DIRECTORY, "raw_images")
 TRANSPARENT_IMAGES_DIR = os.path.join(BASE_DIRECTORY, "transparent_images")
-PROGRESS_FILE = os.path.join(BASE_DIRECTORY, "progress.json")
+PROGRESS_FILE = os.path.join(BASE_DIRECTORY, "progress.jsonl")
+LEGACY_PROGRESS_FILE = os.path.join(BASE_DIRECTORY, "progress.json")  # Pre-journal format, migrated on load
 MANIFEST_FILE = os.path.join(BASE_DIRECTORY, "manifest.json")
+POSTPROCESS_STATE_FILE = os.path.join(BASE_DIRECTORY, "postprocess_state.json")
+STAGE_LOG_FILE = os.path.join(BASE_DIRECTORY, "stage_timings.jsonl")  # Per-stage timings of the last run
+PIXEL_INDEX_FILE = os.path.join(BASE_DIRECTORY, "pixel_hashes.json")
+CHANGES_FILE = os.path.join(BASE_DIRECTORY, "changes.json")
+PNG_OPTIMIZE_STATE_FILE = os.path.join(BASE_DIRECTORY, "png_optimizer_state.json")
+DERIVATIVES_DIR = os.path.join(BASE_DIRECTORY, "derivatives")  # <size>/ folders of resized transparent images
+
+# Release settings (used for changes.json)
+GAME_VERSION = None          # e.g. "1.21.5" - version being captured
+PREVIOUS_VERSION = None      # e.g. "1.21.4" - version to diff against
+PREVIOUS_INDEX_FILE = None   # pixel_hashes.json from the previous version's run; None skips changes.json
+GALLERY_IMAGES_DIR = None    # e.g. "../public/images" - without PREVIOUS_INDEX_FILE, diff against PREVIOUS_VERSION as published there
 
 # Timing settings (in seconds)
 STARTING_DELAY = 10      # Time to wait before starting the script
@@ -61,6 +95,22 @@ INVENTORY_DELAY = 0.1    # Delay after opening inventory
 TAB_DELAY = 0.1          # Delay after pressing tab
 NAVIGATION_DELAY = 0.001  # Delay for navigation keys
 
+# Adaptive timing (replaces the fixed delays above with polling once enabled)
+ADAPTIVE_TIMING = True   # Poll for clipboard/screen readiness and learn delays from observed latency
+POLL_INTERVAL = 0.005    # First wait between readiness polls; doubles after each miss
+MAX_POLL_INTERVAL = 0.05 # Upper bound for the poll backoff
+STEP_TIMEOUT = 1.0       # Give up waiting for a single step after this long
+MIN_DELAY = 0.01         # Learned delays never go below this
+DELAY_SAFETY_FACTOR = 1.5  # Learned delay = smoothed observed latency * this factor
+CALIBRATION_ROUNDS = 3   # Clipboard round trips per letter that tune delays in ID and batch modes
+
+# Item enumeration
+# None      - navigate tab completion for every item (original behaviour)
+# "chat"    - read each letter's completion list once, then give items by exact ID
+# <path>    - read item IDs from a registry dump (text, JSON list, or data generator registries.json)
+ITEM_ID_SOURCE = None
+ITEM_IDS_FILE = os.path.join(BASE_DIRECTORY, "item_ids.txt")  # Where "chat" mode saves the IDs it read
+
 # Starting position
 START_LETTER = "a"       # Which letter to start with
 START_ITEM_INDEX = 0     # Which item index to start with
@@ -68,11 +118,61 @@ START_ITEM_INDEX = 0     # Which item index to start with
 # Other settings
 MAX_CONSECUTIVE_EMPTY = 10  # Number of empty results before moving to next letter
 MAX_ATTEMPTS_PER_LETTER = 200  # Maximum number of attempts for a single letter
+PROGRESS_COMPACT_INTERVAL = 500  # Appends between progress journal compactions
+
+# Transparency settings
+KEY_COLOR = (139, 139, 139)  # Slot background colour that becomes transparent
+KEY_TOLERANCE = 0            # Max per-channel difference still treated as the key colour
+
+# Capture verification settings
+VERIFY_CAPTURES = True       # Check every capture and re-shoot bad ones before the run ends
+MIN_KEY_COVERAGE = None      # e.g. 0.01 - warn (but still save) when fewer slot-grey pixels remain; panes cover the whole slot
+MAX_KEY_COVERAGE = 0.995     # Above this fraction the slot is empty
+TOOLTIP_COLOR = (16, 0, 16)  # Tooltip background colour (vanilla 0xF0100010)
+TOOLTIP_ALPHA = 240 / 255    # Tooltip background opacity; over the slot grey it blends to about (23, 8, 23)
+TOOLTIP_TOLERANCE = 4        # Max per-channel difference from that blend still counted as tooltip
+HOVER_COLOR = (197, 197, 197)  # Slot grey under the hovered-slot highlight (cursor over the slot)
+INTRUSION_THRESHOLD = 0.02   # Fraction of tooltip/hover pixels that marks a capture as obstructed
+EXPECTED_COVERAGE_DIR = None # Transparent images from a previous run to compare keyed coverage against
+COVERAGE_TOLERANCE = 0.15    # Allowed difference from the expected keyed coverage
+MAX_RESHOOT_ATTEMPTS = 2     # Re-capture passes for items that failed verification
+
+# Post-processing settings
+POSTPROCESS_WORKERS = os.cpu_count() or 1  # Worker processes used for transparency keying
+WRITER_QUEUE_SIZE = 64       # Captures waiting for the background writer before capturing blocks
+OPTIMIZE_PNGS = True         # Losslessly shrink the transparent images after keying (png_optimizer.py)
+DERIVATIVE_SIZES = None      # e.g. [32, 64, 256, 384] - resized copies written to DERIVATIVES_DIR; None skips them
 
 # =============================================================================
 # INITIALIZATION
 # =============================================================================
 
+backend = None  # Input/clipboard/screen backend, see capture_backends.py
+
+def use_backend(new_backend):
+    """Route all keystrokes, clipboard access and screenshots through new_backend."""
+    global backend
+    backend = new_backend
+
+def set_base_directory(base_directory):
+    """Point every pipeline file and folder at a different base directory."""
+    global BASE_DIRECTORY, RAW_IMAGES_DIR, TRANSPARENT_IMAGES_DIR, PROGRESS_FILE, LEGACY_PROGRESS_FILE
+    global MANIFEST_FILE, POSTPROCESS_STATE_FILE, STAGE_LOG_FILE, PIXEL_INDEX_FILE, CHANGES_FILE, ITEM_IDS_FILE
+    global PNG_OPTIMIZE_STATE_FILE, DERIVATIVES_DIR
+    BASE_DIRECTORY = base_directory
+    RAW_IMAGES_DIR = os.path.join(BASE_DIRECTORY, "raw_images")
+    TRANSPARENT_IMAGES_DIR = os.path.join(BASE_DIRECTORY, "transparent_images")
+    PROGRESS_FILE = os.path.join(BASE_DIRECTORY, "progress.jsonl")
+    LEGACY_PROGRESS_FILE = os.path.join(BASE_DIRECTORY, "progress.json")
+    MANIFEST_FILE = os.path.join(BASE_DIRECTORY, "manifest.json")
+    POSTPROCESS_STATE_FILE = os.path.join(BASE_DIRECTORY, "postprocess_state.json")
+    STAGE_LOG_FILE = os.path.join(BASE_DIRECTORY, "stage_timings.jsonl")
+    PIXEL_INDEX_FILE = os.path.join(BASE_DIRECTORY, "pixel_hashes.json")
+    CHANGES_FILE = os.path.join(BASE_DIRECTORY, "changes.json")
+    ITEM_IDS_FILE = os.path.join(BASE_DIRECTORY, "item_ids.txt")
+    PNG_OPTIMIZE_STATE_FILE = os.path.join(BASE_DIRECTORY, "png_optimizer_state.json")
+    DERIVATIVES_DIR = os.path.join(BASE_DIRECTORY, "derivatives")
+
 def setup_directories():
     """Create all necessary directories for the pipeline."""
     directories = [RAW_IMAGES_DIR, TRANSPARENT_IMAGES_DIR, BASE_DIRECTORY]
@@ -80,22 +180,403 @@ def setup_directories():
         Path(directory).mkdir(parents=True, exist_ok=True)
         print(f"Created/verified directory: {directory}")
 
-def load_progress():
-    """Load previously processed items or create new progress file."""
-    processed_items = {}
-    if os.path.exists(PROGRESS_FILE):
-        with open(PROGRESS_FILE, 'r') as f:
+class ProgressJournal:
+    """Append-only record of captured items (one JSON object per line).
+
+    Each capture costs a single appended line instead of rewriting the whole
+    progress file. A line torn by a crash is dropped on the next load, and the
+    journal is periodically compacted (rewritten to a temp file and swapped in)
+    so it never accumulates duplicate or damaged entries.
+    """
+
+    def __init__(self, path=None, compact_interval=PROGRESS_COMPACT_INTERVAL):
+        self.path = path or PROGRESS_FILE
+        self.compact_interval = compact_interval
+        self.processed_items = {}
+        self.appends_since_compact = 0
+        self.file = None
+
+    def load(self):
+        """Replay the journal and open it for appending. Returns the processed items dict."""
+        self.processed_items = {}
+        needs_compact = False
+        if os.path.exists(self.path):
+            line_count = 0
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    line_count += 1
+                    try:
+                        self.processed_items[json.loads(line)["item"]] = True
+                    except (json.JSONDecodeError, KeyError, TypeError):
+                        print(f"Skipping damaged progress entry on line {line_count}.")
+                        needs_compact = True
+            needs_compact = needs_compact or line_count != len(self.processed_items)
+            print(f"Loaded progress journal with {len(self.processed_items)} processed items.")
+        elif os.path.exists(LEGACY_PROGRESS_FILE):
+            with open(LEGACY_PROGRESS_FILE, 'r') as f:
+                try:
+                    self.processed_items = dict(json.load(f))
+                    print(f"Migrated {len(self.processed_items)} items from {LEGACY_PROGRESS_FILE}.")
+                except json.JSONDecodeError:
+                    print("Error loading legacy progress file. Starting with empty progress.")
+            needs_compact = True
+        else:
+            print("Created new progress journal.")
+
+        if needs_compact:
+            self.compact()
+        self.file = open(self.path, 'a', encoding='utf-8')
+        return self.processed_items
+
+    def record(self, item_name):
+        """Mark an item as processed with a single durable append."""
+        if item_name in self.processed_items:
+            return
+        self.processed_items[item_name] = True
+        try:
+            self.file.write(json.dumps({"item": item_name}) + "\n")
+            self.file.flush()
+            os.fsync(self.file.fileno())
+        except Exception as e:
+            print(f"Error saving progress: {e}")
+        self.appends_since_compact += 1
+        if self.appends_since_compact >= self.compact_interval:
+            self.compact()
+
+    def compact(self):
+        """Rewrite the journal with one line per processed item."""
+        reopen = self.file is not None
+        if reopen:
+            self.file.close()
+        temp_file = f"{self.path}.tmp"
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            for item_name in self.processed_items:
+                f.write(json.dumps({"item": item_name}) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_file, self.path)
+        self.appends_since_compact = 0
+        if reopen:
+            self.file = open(self.path, 'a', encoding='utf-8')
+
+    def close(self):
+        """Close the journal file."""
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+        print(f"Progress saved: {len(self.processed_items)} items")
+
+    def clear(self):
+        """Delete all recorded progress, including a legacy progress.json."""
+        for path in (self.path, LEGACY_PROGRESS_FILE):
+            if os.path.exists(path):
+                os.remove(path)
+        self.processed_items = {}
+
+# =============================================================================
+# ADAPTIVE TIMING
+# =============================================================================
+
+class AdaptiveDelay:
+    """A delay that polls for readiness and tunes itself from observed latency.
+
+    wait_until() polls a readiness check with exponential backoff and a per-step
+    timeout, recording how long the game took to respond. sleep() is used for
+    steps with nothing to poll (plain keystrokes) and waits for the smoothed
+    observed latency times DELAY_SAFETY_FACTOR. With ADAPTIVE_TIMING off both
+    fall back to the fixed delay.
+    """
+
+    def __init__(self, name, initial_delay, timeout=STEP_TIMEOUT):
+        self.name = name
+        self.initial_delay = initial_delay
+        self.delay = initial_delay
+        self.timeout = timeout
+        self.smoothed_latency = None
+        self.timeouts = 0
+
+    def observe(self, latency):
+        """Fold an observed latency into the learned delay."""
+        if self.smoothed_latency is None:
+            self.smoothed_latency = latency
+        else:
+            self.smoothed_latency = 0.8 * self.smoothed_latency + 0.2 * latency
+        self.delay = min(max(self.smoothed_latency * DELAY_SAFETY_FACTOR, MIN_DELAY), self.timeout)
+
+    def sleep(self):
+        """Wait for the learned delay (or the fixed delay when adaptive timing is off)."""
+        backend.sleep(self.delay if ADAPTIVE_TIMING else self.initial_delay)
+
+    def wait_until(self, ready):
+        """Poll ready() until it returns True or the step times out. Returns whether it became ready."""
+        if not ADAPTIVE_TIMING:
+            backend.sleep(self.initial_delay)
+            return ready()
+        start = backend.clock()
+        interval = POLL_INTERVAL
+        while True:
+            if ready():
+                self.observe(backend.clock() - start)
+                return True
+            if backend.clock() - start >= self.timeout:
+                self.timeouts += 1
+                print(f"Timed out waiting for {self.name} after {self.timeout:.2f} seconds")
+                return False
+            backend.sleep(interval)
+            interval = min(interval * 2, MAX_POLL_INTERVAL)
+
+    def summary(self):
+        """One-line description of what the controller learned."""
+        return f"{self.name}: delay {self.delay * 1000:.0f} ms, {self.timeouts} timeouts"
+
+command_timer = AdaptiveDelay("command", COMMAND_DELAY)   # Keystrokes; learns from clipboard round trips
+tab_timer = AdaptiveDelay("tab completion", TAB_DELAY)
+screen_timer = AdaptiveDelay("inventory render", INVENTORY_DELAY + SCREENSHOT_DELAY)
+
+# =============================================================================
+# CAPTURE VERIFICATION
+# =============================================================================
+
+class CaptureVerifier:
+    """Flags bad captures with cheap whole-array statistics and queues them for a re-shoot.
+
+    A capture fails when the slot is empty, is identical to the previous
+    capture, is covered by a tooltip or the hovered-slot highlight, or its keyed
+    coverage differs from the same item's image in EXPECTED_COVERAGE_DIR.
+    Items that legitimately cover the whole slot (stained glass panes) leave no
+    slot grey, so too little slot background only prints a warning, and only
+    when MIN_KEY_COVERAGE is set.
+    """
+
+    def __init__(self):
+        self.previous_pixels = None
+        self.reshoot_queue = {}
+
+    def find_problem(self, item_name, image):
+        """Return why a capture looks wrong, or None if it looks fine."""
+        rgba = np.asarray(image.convert('RGBA'))
+        pixels = rgba[..., :3]
+        coverage = color_mask(rgba, KEY_COLOR, KEY_TOLERANCE).mean()
+
+        previous = self.previous_pixels
+        self.previous_pixels = pixels
+        if coverage >= MAX_KEY_COVERAGE:
+            return "empty slot"
+        if previous is not None and previous.shape == pixels.shape and np.array_equal(previous, pixels):
+            return "identical to the previous capture"
+        tooltip = np.round(np.multiply(TOOLTIP_COLOR, TOOLTIP_ALPHA) + np.multiply(KEY_COLOR[:3], 1 - TOOLTIP_ALPHA))
+        if color_mask(rgba, tooltip, TOOLTIP_TOLERANCE).mean() >= INTRUSION_THRESHOLD:
+            return "tooltip over the slot"
+        if color_mask(rgba, HOVER_COLOR).mean() >= INTRUSION_THRESHOLD:
+            return "cursor hovering the slot"
+        if MIN_KEY_COVERAGE is not None and coverage < MIN_KEY_COVERAGE:
+            print(f"Warning: capture of {item_name} has little slot background left ({coverage:.1%} keyed)")
+        if EXPECTED_COVERAGE_DIR:
+            expected_path = os.path.join(EXPECTED_COVERAGE_DIR, f"{item_name}.png")
+            if os.path.exists(expected_path):
+                with Image.open(expected_path) as expected:
+                    expected_coverage = (np.asarray(expected.convert('RGBA'))[..., 3] == 0).mean()
+                if abs(coverage - expected_coverage) > COVERAGE_TOLERANCE:
+                    return f"keyed coverage {coverage:.1%} vs expected {expected_coverage:.1%}"
+        return None
+
+    def check(self, item_name, image):
+        """Verify a capture, queueing the item for a re-shoot if it fails. Returns whether it passed."""
+        if not VERIFY_CAPTURES:
+            return True
+        problem = self.find_problem(item_name, image)
+        if problem is None:
+            self.reshoot_queue.pop(item_name, None)
+            return True
+        print(f"Capture of {item_name} looks wrong ({problem}), queued for re-shoot")
+        self.reshoot_queue[item_name] = problem
+        return False
+
+    def take_queue(self):
+        """Return and clear the items waiting for a re-shoot."""
+        queue, self.reshoot_queue = self.reshoot_queue, {}
+        return queue
+
+verifier = CaptureVerifier()
+
+# =============================================================================
+# STAGE TIMING
+# =============================================================================
+
+class StageTimer:
+    """Records how long each capture stage takes and summarises a run.
+
+    Every measurement is appended to STAGE_LOG_FILE as a JSON line
+    ({"stage", "seconds", "letter", "item"}). Measurements come from both the
+    capture loop and the writer thread, so writes are serialised with a lock.
+    """
+
+    def __init__(self, log_file=None):
+        self.log_file = log_file
+        self.file = None
+        self.lock = threading.Lock()
+        self.durations = {}
+        self.letter_seconds = {}
+        self.letter_items = {}
+        self.items = 0
+        self.start_time = None
+
+    def start(self):
+        """Begin a run, replacing the previous run's log."""
+        self.log_file = self.log_file or STAGE_LOG_FILE
+        self.file = open(self.log_file, 'w', encoding='utf-8')
+        self.start_time = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name, letter=None, item=None):
+        """Time the enclosed block as one stage measurement."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start, letter, item)
+
+    def record(self, name, seconds, letter=None, item=None):
+        with self.lock:
+            self.durations.setdefault(name, []).append(seconds)
+            if self.file is not None:
+                self.file.write(json.dumps({"stage": name, "seconds": round(seconds, 6),
+                                            "letter": letter, "item": item}) + "\n")
+
+    def item_done(self, letter, seconds, count=1):
+        """Record time spent on a letter and how many items it captured (count may be 0)."""
+        with self.lock:
+            self.items += count
+            self.letter_seconds[letter] = self.letter_seconds.get(letter, 0.0) + seconds
+            self.letter_items[letter] = self.letter_items.get(letter, 0) + count
+
+    def report(self):
+        """Print p50/p95 per stage, items per minute and the slowest letters."""
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+        if not self.durations:
+            return
+        print("-" * 80)
+        print("STAGE TIMINGS")
+        print(f"{'stage':<20}{'count':>8}{'p50 ms':>10}{'p95 ms':>10}{'total s':>10}")
+        for name, samples in self.durations.items():
+            p50, p95 = np.percentile(samples, [50, 95]) * 1000
+            print(f"{name:<20}{len(samples):>8}{p50:>10.1f}{p95:>10.1f}{sum(samples):>10.1f}")
+        if self.start_time is not None and self.items:
+            minutes = (time.perf_counter() - self.start_time) / 60
+            print(f"Items per minute: {self.items / minutes:.1f}")
+        slowest = sorted(self.letter_seconds, key=self.letter_seconds.get, reverse=True)[:5]
+        for letter in slowest:
+            if not self.letter_items[letter]:
+                print(f"Letter {letter}: {self.letter_seconds[letter]:.1f} s total, no items captured")
+                continue
+            per_item = self.letter_seconds[letter] / self.letter_items[letter]
+            print(f"Letter {letter}: {self.letter_seconds[letter]:.1f} s total, "
+                  f"{per_item:.2f} s per item ({self.letter_items[letter]} items)")
+        print(f"Stage log: {self.log_file}")
+
+stage_timer = StageTimer()
+
+# =============================================================================
+# BACKGROUND WRITER
+# =============================================================================
+
+class CaptureWriter:
+    """Writes captures to disk on a background thread while the next item is captured.
+
+    Captures are keyed in memory as soon as they are submitted, then queued.
+    The writer thread encodes and writes both the raw and transparent PNGs,
+    records the item in the progress journal once both files are on disk, and
+    remembers each file's post-processing state. The final post-processing pass
+    then skips these files instead of decoding them again. Without a running
+    thread, submit() writes inline.
+    """
+
+    def __init__(self, raw_dir=None, out_dir=None, queue_size=WRITER_QUEUE_SIZE):
+        self.raw_dir = raw_dir
+        self.out_dir = out_dir
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.thread = None
+        self.journal = None
+        self.state_entries = {}
+        self.failures = 0
+
+    def start(self, journal):
+        """Start the writer thread, recording finished items in journal."""
+        self.journal = journal
+        self.thread = threading.Thread(target=self._run, name="capture-writer", daemon=True)
+        self.thread.start()
+
+    def submit(self, item_name, image):
+        """Key a capture in memory and hand it to the writer (blocks while the queue is full)."""
+        job = (item_name, image, key_transparency(image))
+        if self.thread is None:
+            self._write(*job)
+        else:
+            self.queue.put(job)
+
+    def _run(self):
+        while True:
+            job = self.queue.get()
             try:
-                processed_items = json.load(f)
-                print(f"Loaded progress file with {len(processed_items)} processed items.")
-            except json.JSONDecodeError:
-                print("Error loading progress file. Starting with empty progress.")
-                processed_items = {}
-    else:
-        with open(PROGRESS_FILE, 'w') as f:
-            json.dump({}, f)
-        print("Created new progress file.")
-    return processed_items
+                if job is None:
+                    return
+                self._write(*job)
+            except Exception as e:
+                # Keep the thread alive: a dead writer would leave submit() and close() blocked on a full queue
+                self.failures += 1
+                print(f"Error finishing {job[0]}.png: {e}")
+            finally:
+                self.queue.task_done()
+
+    def _write(self, item_name, image, transparent):
+        filename = f"{item_name}.png"
+        raw_path = os.path.join(self.raw_dir or RAW_IMAGES_DIR, filename)
+        try:
+            with stage_timer.stage("save", item_name[:1], item_name):
+                buffer = io.BytesIO()
+                image.save(buffer, 'PNG')
+                raw_bytes = buffer.getvalue()
+                with open(raw_path, 'wb') as f:
+                    f.write(raw_bytes)
+                transparent.save(os.path.join(self.out_dir or TRANSPARENT_IMAGES_DIR, filename), 'PNG')
+        except Exception as e:
+            self.failures += 1
+            print(f"Error writing {filename}: {e}")
+            return
+
+        stat = os.stat(raw_path)
+        self.state_entries[filename] = {
+            "mtime": stat.st_mtime_ns,
+            "size": stat.st_size,
+            "hash": hashlib.sha1(raw_bytes).hexdigest(),
+            "pixel_hash": pixel_hash(transparent)
+        }
+        if self.journal is not None:
+            self.journal.record(item_name)
+
+    def close(self, state_file=None):
+        """Flush queued captures, stop the thread and merge what was written into the post-processing state."""
+        if self.thread is not None:
+            self.queue.put(None)
+            self.thread.join()
+            self.thread = None
+        if not self.state_entries:
+            return
+        state_file = state_file or POSTPROCESS_STATE_FILE
+        state = load_postprocess_state(state_file)
+        key = postprocess_key(KEY_COLOR, KEY_TOLERANCE)
+        if state.get("key") != key:
+            state = {"key": key, "files": {}}
+        state["files"].update(self.state_entries)
+        save_postprocess_state(state, state_file)
+        print(f"Writer saved {len(self.state_entries)} captures ({self.failures} failed)")
+        self.state_entries = {}
+
+writer = CaptureWriter()
+
+CLIPBOARD_SENTINEL = "minecraft-item-pipeline-clipboard-probe"  # Must not contain NUL: the Windows clipboard stops at the first one
 
 # =============================================================================
 # IMAGE GENERATION FUNCTIONS
@@ -104,31 +585,93 @@ def load_progress():
 def load_command(current_letter):
     """Load the /give command with the current letter and prepare for tab completion."""
     command = f'/give {PLAYER_NAME} minecraft:{current_letter}'
-    pyautogui.write(command)
-    time.sleep(COMMAND_DELAY)
-    keyboard.press_and_release('tab')
-    time.sleep(TAB_DELAY)
+    backend.write(command)
+    command_timer.sleep()
+    backend.press('tab')
+    tab_timer.sleep()
     
 def copy_command():
-    """Copy the current command to clipboard for item name extraction."""
-    keyboard.press_and_release('ctrl+a')
-    time.sleep(COMMAND_DELAY)
-    keyboard.press_and_release('ctrl+c')
-    time.sleep(COMMAND_DELAY)
+    """Copy the current command to clipboard and return it for item name extraction.
+
+    The clipboard is primed with a sentinel so the copy can be detected by
+    polling instead of waiting a fixed delay; the observed round trip also tunes
+    the delay used after other keystrokes.
+    """
+    backend.copy(CLIPBOARD_SENTINEL)
+    backend.press('ctrl+a')
+    command_timer.sleep()
+    backend.press('ctrl+c')
+    clipboard = {"content": ""}
+
+    def copied():
+        clipboard["content"] = backend.paste()
+        return clipboard["content"] != CLIPBOARD_SENTINEL
+
+    if not command_timer.wait_until(copied):
+        return ""
+    # Tab completion is handled by the same client tick as the copy
+    if command_timer.smoothed_latency is not None:
+        tab_timer.observe(command_timer.smoothed_latency)
+    return clipboard["content"]
+
+def calibrate_command_timing(rounds=CALIBRATION_ROUNDS):
+    """Learn the command delay from clipboard round trips on the open, empty chat line.
+
+    ID and batch modes never copy the chat line while capturing, so without
+    this their keystroke delays would stay at COMMAND_DELAY. Leaves the chat
+    line open and empty.
+    """
+    if not ADAPTIVE_TIMING:
+        return
+    backend.write(give_prefix())
+    command_timer.sleep()
+    for _ in range(rounds):
+        copy_command()
+    backend.press('ctrl+a')
+    backend.press('backspace')
+    command_timer.sleep()
+
+def open_inventory(region):
+    """Press E and return a screenshot of region once the inventory has rendered.
+
+    Waits until the region first differs from how it looked before the
+    inventory opened and then holds still for two consecutive grabs. Animated
+    items (enchantment glint) never settle, so those use the last grab when the
+    step times out.
+    """
+    reference = backend.screenshot(region).tobytes()
+    backend.press('e')
+    frames = {"changed": False, "last": None}
+
+    def rendered():
+        frame = backend.screenshot(region)
+        previous = frames["last"]
+        frames["last"] = frame
+        if not frames["changed"]:
+            frames["changed"] = frame.tobytes() != reference
+            return False
+        return previous is not None and frame.tobytes() == previous.tobytes()
+
+    if not ADAPTIVE_TIMING:
+        backend.sleep(INVENTORY_DELAY + SCREENSHOT_DELAY)
+        return backend.screenshot(region)
+    screen_timer.wait_until(rendered)
+    return frames["last"]
   
 def capture_screen(file_path):
-    """Take a screenshot of the hotbar slot and save it."""
+    """Open the inventory, take a screenshot of the hotbar slot and hand it to the writer.
+
+    Returns whether the capture passed verification. The item is recorded in the
+    progress journal by the writer once its files are on disk.
+    """
     try:
-        time.sleep(SCREENSHOT_DELAY)
-        screenshot = pyautogui.screenshot(region=SCREENSHOT_REGION)
-        screenshot.save(file_path)
-        
-        if os.path.exists(file_path) and os.path.getsize(file_path) > 0:
-            print(f"Screenshot saved successfully: {file_path}")
-            return True
-        else:
-            print(f"Screenshot may not have been saved properly: {file_path}")
+        screenshot = open_inventory(SCREENSHOT_REGION)
+        item_name = os.path.splitext(os.path.basename(file_path))[0]
+        if not verifier.check(item_name, screenshot):
             return False
+        writer.submit(item_name, screenshot)
+        print(f"Screenshot captured: {file_path}")
+        return True
     except Exception as e:
         print(f"Screenshot error: {e}")
         return False
@@ -136,38 +679,254 @@ def capture_screen(file_path):
 def clear_inventory():
     """Clear the player's inventory and reset the command interface."""
     try:
-        keyboard.press_and_release('escape')
-        time.sleep(COMMAND_DELAY)
-        keyboard.press_and_release('/')
-        time.sleep(COMMAND_DELAY)
-        keyboard.press_and_release('backspace')
-        time.sleep(COMMAND_DELAY)
-        pyautogui.write(f'/clear {PLAYER_NAME}')
-        time.sleep(COMMAND_DELAY)
-        keyboard.press_and_release('enter')
-        time.sleep(COMMAND_DELAY)
-        keyboard.press_and_release('/')
-        time.sleep(COMMAND_DELAY)
-        keyboard.press_and_release('backspace')
-        time.sleep(COMMAND_DELAY)
+        backend.press('escape')
+        command_timer.sleep()
+        backend.press('/')
+        command_timer.sleep()
+        backend.press('backspace')
+        command_timer.sleep()
+        backend.write(f'/clear {PLAYER_NAME}')
+        command_timer.sleep()
+        backend.press('enter')
+        command_timer.sleep()
+        backend.press('/')
+        command_timer.sleep()
+        backend.press('backspace')
+        command_timer.sleep()
         return True
     except Exception as e:
         print(f"Inventory clear error: {e}")
         return False
 
-def save_progress(processed_items):
-    """Save the current progress to the progress file."""
+def give_prefix():
+    """Return the text that precedes the item ID in a /give command."""
+    return f'/give {PLAYER_NAME} minecraft:'
+
+def give_item(item_id):
+    """Give the player an item by its exact ID and run the command."""
+    backend.write(f'{give_prefix()}{item_id}')
+    command_timer.sleep()
+    backend.press('enter')
+    command_timer.sleep()
+
+def start_minecraft_command_mode():
+    """Open the Minecraft command interface with an empty command line."""
+    open_command_line()
+
+# =============================================================================
+# ITEM ID ENUMERATION
+# =============================================================================
+
+def load_item_ids(path):
+    """Read item IDs from a registry dump, stripping the minecraft: namespace.
+
+    Accepts a text file with one ID per line, a JSON list of IDs, a JSON object
+    keyed by ID, the data generator's reports/registries.json, or a gallery
+    manifest.json.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        if path.endswith('.json'):
+            data = json.load(f)
+            if isinstance(data, dict) and "minecraft:item" in data:
+                data = data["minecraft:item"]["entries"]
+            elif isinstance(data, dict) and "images" in data:
+                data = [os.path.splitext(image)[0] for image in data["images"]]
+            raw_ids = list(data)
+        else:
+            raw_ids = [line.strip() for line in f if line.strip() and not line.startswith('#')]
+
+    item_ids = set()
+    for raw_id in raw_ids:
+        namespace, _, name = raw_id.rpartition(':')
+        if namespace in ('', 'minecraft') and name != 'air':
+            item_ids.add(name)
+    return sorted(item_ids)
+
+def read_letter_completions(letter):
+    """Walk the tab-completion list for one letter a single time and return its item IDs."""
+    prefix_length = len(give_prefix())
+    load_command(letter)
+    item_ids = []
+    seen = set()
+    consecutive_empty = 0
+
+    for _ in range(MAX_ATTEMPTS_PER_LETTER):
+        clipboard_content = copy_command()
+        if len(clipboard_content) > prefix_length:
+            item_name = clipboard_content[prefix_length:]
+            if item_name in seen:
+                break  # Completion list wrapped around
+            seen.add(item_name)
+            item_ids.append(item_name)
+            consecutive_empty = 0
+        else:
+            consecutive_empty += 1
+            if consecutive_empty >= MAX_CONSECUTIVE_EMPTY:
+                break
+
+        backend.press('down')
+        backend.sleep(NAVIGATION_DELAY)
+        backend.press('tab')
+        backend.sleep(NAVIGATION_DELAY)
+
+    # Clear the chat line for the next command
+    backend.press('ctrl+a')
+    backend.press('backspace')
+    command_timer.sleep()
+    print(f"Letter {letter}: found {len(item_ids)} items")
+    return item_ids
+
+def resolve_item_ids(letters):
+    """Build the full list of item IDs to capture for the given letters, once, up front."""
+    if ITEM_ID_SOURCE == "chat":
+        item_ids = []
+        for letter in letters:
+            item_ids.extend(read_letter_completions(letter))
+        with open(ITEM_IDS_FILE, 'w', encoding='utf-8') as f:
+            f.write("\n".join(item_ids) + "\n")
+        print(f"Saved {len(item_ids)} item IDs to {ITEM_IDS_FILE}")
+    else:
+        item_ids = [item_id for item_id in load_item_ids(ITEM_ID_SOURCE) if item_id[:1] in letters]
+        print(f"Loaded {len(item_ids)} item IDs from {ITEM_ID_SOURCE}")
+    return item_ids
+
+def slot_box(slot):
+    """Return the (left, top, right, bottom) box of an inventory slot inside BATCH_REGION.
+
+    Slots follow the order /give fills them: 0-8 is the hotbar, 9-35 the main
+    inventory rows from top to bottom.
+    """
+    if slot < 9:
+        left = HOTBAR_ORIGIN[0] + slot * SLOT_PITCH[0]
+        top = HOTBAR_ORIGIN[1]
+    else:
+        row, column = divmod(slot - 9, 9)
+        left = INVENTORY_ORIGIN[0] + column * SLOT_PITCH[0]
+        top = INVENTORY_ORIGIN[1] + row * SLOT_PITCH[1]
+    return (left, top, left + SLOT_SIZE[0], top + SLOT_SIZE[1])
+
+def slot_occupied(slot_image):
+    """Whether a slot capture shows an item rather than only the slot background."""
+    coverage = color_mask(np.asarray(slot_image.convert('RGBA')), KEY_COLOR, KEY_TOLERANCE).mean()
+    return coverage < MAX_KEY_COVERAGE
+
+def capture_batch(item_names):
+    """Open the inventory, take one screenshot and slice it into one image per given item.
+
+    Items must have been given in order, so item k sits in slot k. Returns the
+    names whose slot image passed verification and was handed to the writer,
+    or None when the occupied slots are not exactly slots 0..len(item_names)-1
+    (a /give failed), in which case nothing is saved.
+    """
+    saved = []
     try:
-        with open(PROGRESS_FILE, 'w') as f:
-            json.dump(processed_items, f)
-        print(f"Progress saved: {len(processed_items)} items")
+        screenshot = open_inventory(BATCH_REGION)
     except Exception as e:
-        print(f"Error saving progress: {e}")
+        print(f"Screenshot error: {e}")
+        return saved
 
-def start_minecraft_command_mode():
-    """Open the Minecraft command interface."""
-    keyboard.press_and_release('/')
-    time.sleep(COMMAND_DELAY)
+    occupied = [slot for slot in range(36) if slot_occupied(screenshot.crop(slot_box(slot)))]
+    if occupied != list(range(len(item_names))):
+        print(f"Batch of {len(item_names)} items fills {len(occupied)} slots, slots cannot be matched to items")
+        return None
+
+    for slot, item_name in enumerate(item_names):
+        try:
+            slot_image = screenshot.crop(slot_box(slot))
+            if verifier.check(item_name, slot_image):
+                writer.submit(item_name, slot_image)
+                saved.append(item_name)
+        except Exception as e:
+            print(f"Could not save slot {slot} ({item_name}): {e}")
+    print(f"Batch screenshot captured {len(saved)}/{len(item_names)} items")
+    return saved
+
+def open_command_line():
+    """Reopen an empty command line after a command closed the chat."""
+    backend.press('/')
+    command_timer.sleep()
+    backend.press('backspace')
+    command_timer.sleep()
+
+def capture_item_by_id(item_name):
+    """Give one item, capture it from the first hotbar slot and clear the inventory. Returns whether it passed."""
+    give_item(item_name)
+    captured = capture_screen(os.path.join(RAW_IMAGES_DIR, f"{item_name}.png"))
+    clear_inventory()
+    return captured
+
+def capture_items_by_id(item_ids, journal):
+    """Give and capture each item by exact ID. Returns the last item captured.
+
+    With BATCH_SIZE > 1, up to a full inventory of items is given before a single
+    screenshot is sliced per slot and the inventory is cleared once.
+    """
+    last_valid_item = ""
+    batch_size = max(1, min(BATCH_SIZE, 36))
+    pending = [item_name for item_name in item_ids if item_name not in journal.processed_items]
+    calibrated_letter = None
+
+    for start in range(0, len(pending), batch_size):
+        batch = pending[start:start + batch_size]
+        start_time = time.time()
+        letter = batch[0][:1]
+        if letter != calibrated_letter:
+            with stage_timer.stage("calibrate", letter):
+                calibrate_command_timing()
+            calibrated_letter = letter
+        print(f"Capturing items: {', '.join(batch)}")
+
+        with stage_timer.stage("give_item", letter, batch[0]):
+            for i, item_name in enumerate(batch):
+                if i > 0:
+                    open_command_line()
+                give_item(item_name)
+
+        with stage_timer.stage("capture_screen", letter, batch[0]):
+            if batch_size == 1:
+                file_path = os.path.join(RAW_IMAGES_DIR, f"{batch[0]}.png")
+                captured = batch if capture_screen(file_path) else []
+            else:
+                captured = capture_batch(batch)
+        with stage_timer.stage("clear_inventory", letter, batch[0]):
+            clear_inventory()
+        if captured is None:
+            # A /give in the batch failed, so fall back to one item per screenshot
+            print("Capturing the batch one item at a time")
+            with stage_timer.stage("capture_screen", letter, batch[0]):
+                captured = [item_name for item_name in batch if capture_item_by_id(item_name)]
+        if captured:
+            last_valid_item = captured[-1]
+
+        if backend.is_pressed('caps lock'):
+            print("CAPSLOCK key held down, stopping program.")
+            break
+
+        elapsed_time = time.time() - start_time
+        # Share the batch time out per item, so a batch spanning letters is attributed to each item's letter
+        for item_letter in sorted({item_name[:1] for item_name in batch}):
+            names = [item_name for item_name in batch if item_name[:1] == item_letter]
+            stage_timer.item_done(item_letter, elapsed_time * len(names) / len(batch),
+                                  sum(1 for item_name in names if item_name in (captured or [])))
+        print(f"Time Elapsed for {len(batch)} items: {elapsed_time:.2f} seconds")
+    return last_valid_item
+
+def reshoot_failed_captures(journal):
+    """Re-capture, one at a time and by exact ID, every item that failed verification.
+
+    Returns the items that still failed after MAX_RESHOOT_ATTEMPTS passes.
+    """
+    for attempt in range(1, MAX_RESHOOT_ATTEMPTS + 1):
+        queue = verifier.take_queue()
+        if not queue:
+            return {}
+        print(f"Re-shoot pass {attempt}: {len(queue)} items")
+        for item_name in queue:
+            capture_item_by_id(item_name)
+            if backend.is_pressed('caps lock'):
+                print("CAPSLOCK key held down, stopping re-shoots.")
+                return verifier.take_queue()
+    return verifier.take_queue()
 
 # =============================================================================
 # LIST AND MANIFEST GENERATION
@@ -203,7 +962,41 @@ def create_manifest(items):
 # TRANSPARENCY PROCESSING
 # =============================================================================
 
-def process_transparency():
+# Pixels as native-endian uint32: the RGB bytes of a pixel, and a transparent white pixel
+RGB_BITS = np.array([255, 255, 255, 0], dtype=np.uint8).view(np.uint32)[0]
+TRANSPARENT_PIXEL = np.array([255, 255, 255, 0], dtype=np.uint8).view(np.uint32)[0]
+
+def color_mask(pixels, color, tolerance=0):
+    """Boolean (height, width) mask of the pixels whose RGB channels are each within tolerance of color.
+
+    pixels is a C-contiguous (height, width, 4) uint8 RGBA array. Exact matches
+    compare each pixel as one uint32 with the alpha byte masked off; with a
+    tolerance every channel gets a range test on the uint8 values directly.
+    """
+    if tolerance == 0:
+        key = np.array([*color[:3], 0], dtype=np.uint8).view(np.uint32)[0]
+        return (pixels.view(np.uint32)[..., 0] & RGB_BITS) == key
+    mask = None
+    for channel, value in enumerate(color[:3]):
+        low, high = max(0, int(value) - tolerance), min(255, int(value) + tolerance)
+        # One unsigned compare: values below low wrap around to large numbers
+        in_range = (pixels[..., channel] - np.uint8(low)) <= np.uint8(high - low)
+        mask = in_range if mask is None else mask & in_range
+    return mask
+
+def key_transparency(image, key_color=KEY_COLOR, tolerance=KEY_TOLERANCE):
+    """Return an RGBA copy of the image with every key-coloured pixel made transparent.
+
+    Works on the whole pixel array at once, as packed uint32 pixels, instead of
+    looping over getdata(). A pixel is keyed when each of its RGB channels is
+    within `tolerance` of `key_color`.
+    """
+    pixels = np.array(image.convert('RGBA'))
+    packed = pixels.view(np.uint32)[..., 0]
+    packed[color_mask(pixels, key_color, tolerance)] = TRANSPARENT_PIXEL
+    return Image.fromarray(pixels)
+
+def process_transparency(key_color=KEY_COLOR, tolerance=KEY_TOLERANCE):
     """Process all images to create transparent versions."""
     print("Processing images for transparency...")
     
@@ -214,24 +1007,153 @@ def process_transparency():
         print(f"Processing: {filename}")
         
         with Image.open(os.path.join(RAW_IMAGES_DIR, filename)) as im:
-            # Convert to RGBA
-            rgba = im.convert('RGBA')
-            datas = rgba.getdata()
-            
-            # Change all grey pixels (139,139,139) to transparent
-            new_data = []
-            for item in datas:
-                if item[0] == 139 and item[1] == 139 and item[2] == 139:
-                    new_data.append((255, 255, 255, 0))  # Transparent
-                else:
-                    new_data.append(item)
-            
-            # Save new transparent image
-            rgba.putdata(new_data)
+            # Change all key-coloured pixels to transparent and save the new image
+            rgba = key_transparency(im, key_color, tolerance)
             rgba.save(os.path.join(TRANSPARENT_IMAGES_DIR, filename), 'PNG')
     
     print("Transparency processing complete!")
 
+# =============================================================================
+# INCREMENTAL POST-PROCESSING
+# =============================================================================
+
+def load_postprocess_state(state_file=POSTPROCESS_STATE_FILE):
+    """Load the raw-image state recorded by the last post-processing run."""
+    if os.path.exists(state_file):
+        with open(state_file, 'r') as f:
+            try:
+                return json.load(f)
+            except json.JSONDecodeError:
+                print("Error loading post-processing state. Re-processing everything.")
+    return {"key": None, "files": {}}
+
+def save_postprocess_state(state, state_file=POSTPROCESS_STATE_FILE):
+    """Write the post-processing state atomically so a crash never leaves half a file."""
+    temp_file = f"{state_file}.tmp"
+    with open(temp_file, 'w') as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+    os.replace(temp_file, state_file)
+
+def postprocess_key(key_color, tolerance):
+    """Return the keying settings recorded in the post-processing state."""
+    return list(key_color[:3]) + [tolerance]
+
+def key_image_file(task):
+    """Key a single raw PNG into its transparent version (runs in a worker process).
+
+    Returns (filename, raw_hash, output_pixel_hash, written). The raw file is only
+    decoded when its content hash differs from the previous run, and the output
+    is only written when the encoded bytes actually changed.
+    """
+    filename, raw_path, out_path, key_color, tolerance, previous_hash, previous_pixel_hash = task
+    with open(raw_path, 'rb') as f:
+        raw_bytes = f.read()
+    raw_hash = hashlib.sha1(raw_bytes).hexdigest()
+    if raw_hash == previous_hash and previous_pixel_hash and os.path.exists(out_path):
+        return filename, raw_hash, previous_pixel_hash, False
+
+    with Image.open(io.BytesIO(raw_bytes)) as im:
+        rgba = key_transparency(im, key_color, tolerance)
+    output_pixel_hash = pixel_hash(rgba)
+    buffer = io.BytesIO()
+    rgba.save(buffer, 'PNG')
+    encoded = buffer.getvalue()
+
+    if os.path.exists(out_path):
+        with open(out_path, 'rb') as f:
+            if f.read() == encoded:
+                return filename, raw_hash, output_pixel_hash, False
+    with open(out_path, 'wb') as f:
+        f.write(encoded)
+    return filename, raw_hash, output_pixel_hash, True
+
+def post_process(raw_dir=RAW_IMAGES_DIR, out_dir=TRANSPARENT_IMAGES_DIR,
+                 state_file=POSTPROCESS_STATE_FILE, workers=POSTPROCESS_WORKERS,
+                 key_color=KEY_COLOR, tolerance=KEY_TOLERANCE):
+    """Incrementally create transparent versions of new or changed raw images.
+
+    Raw files whose size and mtime match the last run are skipped without being
+    read. Everything else is keyed in a process pool. Changing the key colour or
+    tolerance invalidates the whole state.
+
+    Returns the pixel hash index of the transparent outputs.
+    """
+    print("Post-processing raw images...")
+    Path(out_dir).mkdir(parents=True, exist_ok=True)
+    state = load_postprocess_state(state_file)
+    key = postprocess_key(key_color, tolerance)
+    if state.get("key") != key:
+        state = {"key": key, "files": {}}
+    known = state["files"]
+
+    tasks = []
+    current = {}
+    for entry in os.scandir(raw_dir):
+        if not entry.name.endswith('.png'):
+            continue
+        stat = entry.stat()
+        current[entry.name] = (stat.st_mtime_ns, stat.st_size)
+        out_path = os.path.join(out_dir, entry.name)
+        previous = known.get(entry.name)
+        if (previous and previous["mtime"] == stat.st_mtime_ns and previous["size"] == stat.st_size
+                and previous.get("pixel_hash") and os.path.exists(out_path)):
+            continue
+        previous_hash = previous["hash"] if previous else None
+        previous_pixel_hash = previous.get("pixel_hash") if previous else None
+        tasks.append((entry.name, entry.path, out_path, key_color, tolerance,
+                      previous_hash, previous_pixel_hash))
+
+    written = 0
+    if tasks:
+        workers = max(1, min(workers, len(tasks)))
+        if workers == 1:
+            results = list(map(key_image_file, tasks))
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                chunksize = max(1, len(tasks) // (workers * 4))
+                results = list(executor.map(key_image_file, tasks, chunksize=chunksize))
+        for filename, raw_hash, output_pixel_hash, changed in results:
+            mtime, size = current[filename]
+            known[filename] = {"mtime": mtime, "size": size, "hash": raw_hash,
+                               "pixel_hash": output_pixel_hash}
+            if changed:
+                written += 1
+                print(f"Processed: {filename}")
+
+    for filename in list(known):
+        if filename not in current:
+            del known[filename]
+
+    save_postprocess_state(state, state_file)
+    print(f"Post-processing complete! {len(tasks)} checked, {written} written, "
+          f"{len(current) - len(tasks)} unchanged.")
+    return {filename: entry["pixel_hash"] for filename, entry in known.items()}
+
+def run_post_processing():
+    """Create the item list, manifest and transparent images from the raw captures."""
+    print("\nGenerating item list and manifest...")
+    items = create_item_list()
+    create_manifest(items)
+
+    print("\nProcessing images for transparency...")
+    index = post_process(RAW_IMAGES_DIR, TRANSPARENT_IMAGES_DIR, POSTPROCESS_STATE_FILE)
+    if OPTIMIZE_PNGS:
+        # Pixel data is unchanged, so the pixel hash index stays valid
+        optimize_directory(TRANSPARENT_IMAGES_DIR, PNG_OPTIMIZE_STATE_FILE, POSTPROCESS_WORKERS)
+    if DERIVATIVE_SIZES:
+        build_derivatives(TRANSPARENT_IMAGES_DIR, DERIVATIVES_DIR, sizes=DERIVATIVE_SIZES,
+                          workers=POSTPROCESS_WORKERS, optimize=OPTIMIZE_PNGS)
+
+    # Persist the content-hash index and diff it against the previous version
+    save_index(index, PIXEL_INDEX_FILE)
+    print(f"Pixel hash index saved: {PIXEL_INDEX_FILE}")
+    if PREVIOUS_INDEX_FILE:
+        write_changes(CHANGES_FILE, index, load_index(PREVIOUS_INDEX_FILE), GAME_VERSION, PREVIOUS_VERSION)
+    elif GALLERY_IMAGES_DIR and PREVIOUS_VERSION:
+        print(f"Hashing {PREVIOUS_VERSION} from {GALLERY_IMAGES_DIR}...")
+        previous = build_gallery_index(GALLERY_IMAGES_DIR, PREVIOUS_VERSION)
+        write_changes(CHANGES_FILE, index, previous, GAME_VERSION, PREVIOUS_VERSION)
+
 # =============================================================================
 # MAIN SCRIPT
 # =============================================================================
@@ -258,32 +1180,11 @@ def main():
             break
         print("Invalid input. Please enter 'y' or 'n'.")
     
+    journal = ProgressJournal()
     if clear_progress == 'y':
-        if os.path.exists(PROGRESS_FILE):
-            os.remove(PROGRESS_FILE)
-            print("Progress file cleared.")
-        processed_items = {}
-    else:
-        processed_items = load_progress()
-    
-    # Initialize alphabet and starting position
-    alphabet = ["a", "b", "c", "d", "e", "f", "g", "h", "i", "j", "k", "l", 
-                "m", "n", "o", "p", "q", "r", "s", "t", "u", "v", "w", "x", "y", "z"]
-    
-    try:
-        letter_index = alphabet.index(START_LETTER.lower())
-    except ValueError:
-        print(f"Warning: '{START_LETTER}' is not a valid letter. Starting with 'a'.")
-        letter_index = 0
-    
-    # Initialize variables
-    letter = alphabet[letter_index]
-    letter2 = "a"
-    item_index = START_ITEM_INDEX
-    consecutive_empty = 0
-    last_valid_item = ""
-    letter_attempt_count = 0
-    current_letter_items = set()
+        journal.clear()
+        print("Progress file cleared.")
+    journal.load()
     
     # Print startup instructions
     print("=" * 80)
@@ -298,6 +1199,7 @@ def main():
     print("-" * 80)
     print(f"Starting Letter: {START_LETTER}")
     print(f"Starting Item Index: {START_ITEM_INDEX}")
+    print(f"Item ID source: {ITEM_ID_SOURCE or 'tab-completion navigation'}")
     print(f"Raw images will be saved to: {RAW_IMAGES_DIR}")
     print(f"Transparent images will be saved to: {TRANSPARENT_IMAGES_DIR}")
     print("-" * 80)
@@ -309,10 +1211,51 @@ def main():
     print("Starting automation!")
     print("=" * 80)
     
+    run_capture(journal, START_LETTER)
+
+def run_capture(journal, start_letter="a", start_item_index=START_ITEM_INDEX):
+    """Run the capture loop, re-shoots and post-processing against the current backend.
+
+    Expects an open command-ready game (or SimulatedGame) and a loaded
+    ProgressJournal. Used by main() after its prompts and countdown, and by
+    simulate_capture.py to run the whole loop headless.
+    """
+    if backend is None:
+        use_backend(DesktopBackend())
+    processed_items = journal.processed_items
+    
+    # Initialize alphabet and starting position
+    alphabet = ["a", "b", "c", "d", "e", "f", "g", "h", "i", "j", "k", "l", 
+                "m", "n", "o", "p", "q", "r", "s", "t", "u", "v", "w", "x", "y", "z"]
+    
     try:
-        # Start Minecraft command interface
+        letter_index = alphabet.index(start_letter.lower())
+    except ValueError:
+        print(f"Warning: '{start_letter}' is not a valid letter. Starting with 'a'.")
+        letter_index = 0
+    
+    # Initialize variables
+    letter = alphabet[letter_index]
+    letter2 = "a"
+    item_index = start_item_index
+    consecutive_empty = 0
+    last_valid_item = ""
+    failed_captures = {}
+    letter_attempt_count = 0
+    current_letter_items = set()
+    
+    try:
+        # Start the background writer and Minecraft command interface
+        stage_timer.start()
+        writer.start(journal)
         start_minecraft_command_mode()
         
+        # Enumerate item IDs once and give each by exact ID
+        if ITEM_ID_SOURCE:
+            item_ids = resolve_item_ids(alphabet[letter_index:])
+            last_valid_item = capture_items_by_id(item_ids, journal) or last_valid_item
+            letter_index = len(alphabet)  # Skip the tab-navigation loop below
+        
         # Main image generation loop
         while letter_index < len(alphabet):
             start_time = time.time()
@@ -334,23 +1277,25 @@ def main():
                 continue
             
             # Load command and process item
-            load_command(letter)
+            with stage_timer.stage("load_command", letter):
+                load_command(letter)
             
             # Navigate to item
-            for i in range(item_index):
-                keyboard.press_and_release('down')
-                time.sleep(NAVIGATION_DELAY)
-                keyboard.press_and_release('tab')
-                time.sleep(NAVIGATION_DELAY)
+            with stage_timer.stage("navigation", letter):
+                for i in range(item_index):
+                    backend.press('down')
+                    backend.sleep(NAVIGATION_DELAY)
+                    backend.press('tab')
+                    backend.sleep(NAVIGATION_DELAY)
             
             # Get item name
-            copy_command()
-            clipboard_content = pyperclip.paste()
+            with stage_timer.stage("copy_command", letter):
+                clipboard_content = copy_command()
+            item_captured = False
             
-            if len(clipboard_content) > 28:
-                item_name = clipboard_content[28:]
-                current_letter = clipboard_content[28:29]
-                current_letter2 = clipboard_content[29:30] if len(clipboard_content) > 29 else ""
+            prefix_length = len(give_prefix())
+            if len(clipboard_content) > prefix_length:
+                item_name = clipboard_content[prefix_length:]
                 
                 print(f"Found item: {item_name}")
                 
@@ -374,18 +1319,18 @@ def main():
                     file_path = os.path.join(RAW_IMAGES_DIR, f"{item_name}.png")
                     
                     # Get item and take screenshot
-                    keyboard.press_and_release('enter')
-                    time.sleep(COMMAND_DELAY)
-                    keyboard.press_and_release('e')
-                    time.sleep(INVENTORY_DELAY)
+                    with stage_timer.stage("capture_screen", letter, item_name):
+                        backend.press('enter')
+                        command_timer.sleep()
+                        captured = capture_screen(file_path)
                     
-                    if capture_screen(file_path):
-                        processed_items[item_name] = True
+                    if captured:
                         last_valid_item = item_name
                         consecutive_empty = 0
-                        save_progress(processed_items)
+                        item_captured = True
                     
-                    clear_inventory()
+                    with stage_timer.stage("clear_inventory", letter, item_name):
+                        clear_inventory()
                 else:
                     print(f"Item {item_name} already processed, skipping")
                     consecutive_empty = 0
@@ -406,7 +1351,7 @@ def main():
                     continue
             
             # Check for user interrupt
-            if keyboard.is_pressed('caps lock'):
+            if backend.is_pressed('caps lock'):
                 print("CAPSLOCK key held down, stopping program.")
                 break
             
@@ -416,32 +1361,44 @@ def main():
             # Display timing
             end_time = time.time()
             elapsed_time = end_time - start_time
+            stage_timer.item_done(letter, elapsed_time, 1 if item_captured else 0)
             print(f"Time Elapsed for item #{item_index}: {elapsed_time:.2f} seconds")
             
-            time.sleep(COMMAND_DELAY)
+            command_timer.sleep()
         
-        # After image generation, create list and manifest
-        print("\nGenerating item list and manifest...")
-        items = create_item_list()
-        create_manifest(items)
+        # Re-capture anything the verifier flagged
+        failed_captures = reshoot_failed_captures(journal)
+        writer.close()
         
-        # Process transparency
-        print("\nProcessing images for transparency...")
-        process_transparency()
+        # After image generation, create list, manifest and transparent images
+        with stage_timer.stage("post_processing"):
+            run_post_processing()
         
     except Exception as e:
         print(f"Error: {e}")
         import traceback
         traceback.print_exc()
     finally:
-        # Save final progress
-        save_progress(processed_items)
+        # Flush pending captures and save final progress
+        writer.close()
+        journal.close()
         print("=" * 80)
         print(f"Pipeline completed. Last processed item: {last_valid_item}")
         print(f"Progress saved to {PROGRESS_FILE}")
         print(f"Total items processed: {len(processed_items)}")
+        if ADAPTIVE_TIMING:
+            for timer in (command_timer, tab_timer, screen_timer):
+                print(f"Learned timing - {timer.summary()}")
+        stage_timer.report()
         print("=" * 80)
+        for item_name, problem in failed_captures.items():
+            print(f"Still failing after re-shoots: {item_name} ({problem})")
         print("!IMPORTANT! - Make sure to check the images to make sure they generated correctly. Also make sure images in the transparent_images folder are not messed up. POLISHED_DIORITE is a usual suspect.")
 
+
 if __name__ == "__main__":
-    main() 
+    if "--post-process" in sys.argv[1:]:
+        setup_directories()
+        run_post_processing()
+    else:
+        main()
@@ -0,0 +1,272 @@
+"""
+Generation Tools Benchmark
+
+Times the Python generation stages on synthetic item sets so their cost can be
+tracked as the catalog grows. For each set size a folder of 128x128 raw
+captures (slot-grey background, pixel-art sprite) is generated once and every
+stage is run against it in a fresh child process (stages that read keyed
+images get them from an untimed post-processing pass first), recording:
+
+- wall time
+- peak RSS of the stage, including any worker processes it starts
+- files per second
+
+Results are written as JSON, along with the commit, Python version and CPU
+count, so runs from different pipeline versions or machines can be compared
+with --compare.
+
+Usage:
+    python benchmark.py
+    python benchmark.py --sizes 1000 10000 --stages process_transparency post_process
+    python benchmark.py --compare benchmark_results/old.json
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import queue
+import argparse
+import platform
+import tempfile
+import subprocess
+import multiprocessing
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+DEFAULT_SIZES = [1000, 10000, 50000]
+STAGES = ["create_item_list", "create_manifest", "process_transparency", "post_process", "optimize_pngs",
+          "derivatives", "create_collage"]
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_results")
+
+# =============================================================================
+# SYNTHETIC DATA
+# =============================================================================
+
+def write_synthetic_chunk(task):
+    """Write raw captures item_<start>..item_<end-1> into raw_dir (runs in a worker process)."""
+    raw_dir, start, end = task
+    from PIL import Image
+    from capture_backends import SimulatedGame
+    game = SimulatedGame([], "")
+    for i in range(start, end):
+        item_name = f"item_{i:06d}"
+        Image.fromarray(game.sprite(item_name)).save(os.path.join(raw_dir, f"{item_name}.png"))
+    return end - start
+
+def generate_item_set(base_dir, count, workers=None):
+    """Create base_dir/raw_images with count synthetic 128x128 captures."""
+    raw_dir = os.path.join(base_dir, "raw_images")
+    os.makedirs(raw_dir, exist_ok=True)
+    chunk = 500
+    tasks = [(raw_dir, start, min(start + chunk, count)) for start in range(0, count, chunk)]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        written = sum(executor.map(write_synthetic_chunk, tasks))
+    return raw_dir, written
+
+# =============================================================================
+# STAGES
+# =============================================================================
+
+def peak_rss_mb():
+    """Peak resident set size of this process and its finished children, in MB."""
+    if resource is not None:
+        peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                   resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+        # ru_maxrss is in bytes on macOS and kilobytes elsewhere
+        return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+    try:
+        import psutil
+        return psutil.Process().memory_info().peak_wset / (1024 * 1024)
+    except (ImportError, AttributeError):
+        return None
+
+def run_stage(stage, base_dir, results):
+    """Run one stage against base_dir in this (child) process and report its measurements."""
+    sys.stdout = open(os.devnull, 'w')
+    import MinecraftItemPipeline as pipeline
+    pipeline.set_base_directory(base_dir)
+    pipeline.setup_directories()
+
+    try:
+        start = time.perf_counter()
+        run_stage_body(stage, base_dir, pipeline)
+    except Exception as e:
+        results.put({"error": f"{type(e).__name__}: {e}"})
+        return
+    seconds = time.perf_counter() - start
+    results.put({"seconds": seconds, "peak_rss_mb": peak_rss_mb()})
+
+def keyed_images(base_dir, pipeline, folder):
+    """Post-process the raw captures into base_dir/folder (not timed) and return its path."""
+    out_dir = os.path.join(base_dir, folder)
+    shutil.rmtree(out_dir, ignore_errors=True)
+    pipeline.post_process(pipeline.RAW_IMAGES_DIR, out_dir, os.path.join(base_dir, f"{folder}_state.json"))
+    return out_dir
+
+def prepare_stage(stage, base_dir):
+    """Create the input a stage reads (in its own process), so every stage can be run on its own."""
+    sys.stdout = open(os.devnull, 'w')
+    import MinecraftItemPipeline as pipeline
+    pipeline.set_base_directory(base_dir)
+    pipeline.setup_directories()
+    if stage == "optimize_pngs":
+        keyed_images(base_dir, pipeline, "optimize_input")
+    elif stage == "derivatives":
+        keyed_images(base_dir, pipeline, "derivatives_input")
+
+def run_stage_body(stage, base_dir, pipeline):
+    """The work timed for one stage."""
+    if stage == "create_item_list":
+        pipeline.create_item_list()
+    elif stage == "create_manifest":
+        pipeline.create_manifest(pipeline.create_item_list())
+    elif stage == "process_transparency":
+        pipeline.process_transparency()
+    elif stage == "post_process":
+        # Fresh output folder and state so this measures a full first run
+        out_dir = os.path.join(base_dir, "post_processed")
+        state_file = os.path.join(base_dir, "benchmark_postprocess_state.json")
+        shutil.rmtree(out_dir, ignore_errors=True)
+        if os.path.exists(state_file):
+            os.remove(state_file)
+        pipeline.post_process(pipeline.RAW_IMAGES_DIR, out_dir, state_file)
+    elif stage == "optimize_pngs":
+        # Runs on freshly keyed images, without a state file so every image is optimized
+        import png_optimizer
+        png_optimizer.optimize_directory(os.path.join(base_dir, "optimize_input"))
+    elif stage == "derivatives":
+        # Fresh output folder so every size of every item is generated
+        import derivatives
+        out_dir = os.path.join(base_dir, "derivatives")
+        shutil.rmtree(out_dir, ignore_errors=True)
+        derivatives.build_derivatives(os.path.join(base_dir, "derivatives_input"), out_dir)
+    elif stage == "create_collage":
+        import create_collage
+        paths = create_collage.find_image_files(pipeline.RAW_IMAGES_DIR)
+        create_collage.create_collage(paths, create_collage.OUTPUT_WIDTH, create_collage.OUTPUT_HEIGHT,
+                                      create_collage.NUM_IMAGES_TO_PLACE,
+                                      os.path.join(base_dir, create_collage.OUTPUT_FILENAME))
+
+def measure_stage(stage, base_dir, file_count):
+    """Run a stage in a fresh process so its peak RSS is not polluted by earlier stages."""
+    context = multiprocessing.get_context("spawn")
+    preparation = context.Process(target=prepare_stage, args=(stage, base_dir))
+    preparation.start()
+    preparation.join()
+    if preparation.exitcode != 0:
+        return {"stage": stage, "files": file_count, "seconds": None, "files_per_second": None,
+                "peak_rss_mb": None, "error": f"preparing the stage input failed (exit code {preparation.exitcode})"}
+    results = context.Queue()
+    process = context.Process(target=run_stage, args=(stage, base_dir, results))
+    process.start()
+    # Poll so a child that dies without reporting (crash, kill) cannot block the run
+    measurement = None
+    while measurement is None:
+        try:
+            measurement = results.get(timeout=1)
+        except queue.Empty:
+            if not process.is_alive():
+                try:
+                    measurement = results.get(timeout=1)  # Reported just before exiting
+                except queue.Empty:
+                    measurement = {"error": f"stage process exited with code {process.exitcode}"}
+    process.join()
+    if "error" in measurement:
+        return {"stage": stage, "files": file_count, "seconds": None, "files_per_second": None,
+                "peak_rss_mb": None, "error": measurement["error"]}
+    seconds = measurement["seconds"]
+    return {
+        "stage": stage,
+        "files": file_count,
+        "seconds": round(seconds, 4),
+        "files_per_second": round(file_count / seconds, 1) if seconds > 0 else None,
+        "peak_rss_mb": round(measurement["peak_rss_mb"], 1) if measurement["peak_rss_mb"] is not None else None
+    }
+
+# =============================================================================
+# RESULTS
+# =============================================================================
+
+def environment_info():
+    """Describe the machine and code version the benchmark ran on."""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpuCount": os.cpu_count(),
+        "createdAt": datetime.now().isoformat()
+    }
+
+def compare_results(current, previous):
+    """Print the wall-time ratio of every stage/size present in both runs."""
+    previous_by_key = {(r["stage"], r["files"]): r for r in previous["results"]}
+    print("-" * 80)
+    print(f"Compared with {previous['environment'].get('commit')} ({previous['environment'].get('createdAt')})")
+    for result in current["results"]:
+        old = previous_by_key.get((result["stage"], result["files"]))
+        if old and old["seconds"] and result["seconds"]:
+            ratio = result["seconds"] / old["seconds"]
+            print(f"{result['stage']:<22}{result['files']:>8}  {old['seconds']:>9.2f}s -> {result['seconds']:>9.2f}s  "
+                  f"({ratio:.2f}x)")
+
+# =============================================================================
+# MAIN SCRIPT
+# =============================================================================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the Python generation stages on synthetic item sets.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="Item set sizes to generate")
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=STAGES, help="Stages to time")
+    parser.add_argument("--output", help="Results JSON path (defaults to benchmark_results/<timestamp>.json)")
+    parser.add_argument("--compare", help="Previous results JSON to compare against")
+    parser.add_argument("--work-dir", help="Where to generate the synthetic sets (defaults to a temp folder)")
+    args = parser.parse_args(argv)
+
+    run = {"environment": environment_info(), "results": []}
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="item-benchmark-")
+    try:
+        for size in args.sizes:
+            base_dir = os.path.join(work_dir, str(size))
+            start = time.perf_counter()
+            _, written = generate_item_set(base_dir, size)
+            print(f"Generated {written} synthetic items in {time.perf_counter() - start:.1f} seconds")
+
+            for stage in args.stages:
+                result = measure_stage(stage, base_dir, written)
+                run["results"].append(result)
+                if result.get("error"):
+                    print(f"  {stage:<22}FAILED: {result['error']}")
+                    continue
+                rss = f"{result['peak_rss_mb']:.0f} MB" if result["peak_rss_mb"] is not None else "n/a"
+                print(f"  {stage:<22}{result['seconds']:>9.2f}s  {result['files_per_second'] or 0:>9.1f} files/s  "
+                      f"peak {rss}")
+            if not args.work_dir:
+                shutil.rmtree(base_dir, ignore_errors=True)
+    finally:
+        if not args.work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(run, f, indent=2)
+    print(f"Results saved to {output}")
+
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            compare_results(run, json.load(f))
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
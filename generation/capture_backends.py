@@ -0,0 +1,262 @@
+"""
+Capture Backends
+
+The I/O the capture loop in MinecraftItemPipeline.py needs, behind one small
+interface so the loop can run against a real Minecraft window or a simulated
+game:
+
+    write(text)          type text
+    press(key)           press and release a key ('tab', 'ctrl+a', 'enter', ...)
+    is_pressed(key)      whether a key is held down (CAPS LOCK stops the run)
+    copy(text), paste()  clipboard access
+    screenshot(region)   PIL image of an (x, y, width, height) screen region
+    sleep(seconds)       wait between steps
+    clock()              seconds on the backend's clock, used for timeouts
+
+DesktopBackend drives the real game with pyautogui, keyboard and pyperclip.
+SimulatedGame models the parts of Minecraft the loop depends on - chat,
+tab completion over a registry list, /give and /clear, and slot rendering - on
+a virtual clock, so the whole loop runs at full CPU speed without a display.
+"""
+
+import time
+import hashlib
+import numpy as np
+from PIL import Image
+
+# =============================================================================
+# DESKTOP BACKEND
+# =============================================================================
+
+class DesktopBackend:
+    """Drives a real Minecraft window. pyautogui, keyboard and pyperclip are imported on creation."""
+
+    def __init__(self):
+        import pyautogui
+        import keyboard
+        import pyperclip
+        self.pyautogui = pyautogui
+        self.keyboard = keyboard
+        self.pyperclip = pyperclip
+
+    def write(self, text):
+        self.pyautogui.write(text)
+
+    def press(self, key):
+        self.keyboard.press_and_release(key)
+
+    def is_pressed(self, key):
+        return self.keyboard.is_pressed(key)
+
+    def copy(self, text):
+        self.pyperclip.copy(text)
+
+    def paste(self):
+        return self.pyperclip.paste()
+
+    def screenshot(self, region):
+        return self.pyautogui.screenshot(region=region)
+
+    def sleep(self, seconds):
+        time.sleep(seconds)
+
+    def clock(self):
+        return time.perf_counter()
+
+# =============================================================================
+# SIMULATED GAME
+# =============================================================================
+
+WORLD_COLOR = (112, 152, 204)  # What the capture region shows while the inventory is closed
+SLOT_COLOR = (139, 139, 139)   # Slot background, the colour the pipeline keys out
+
+class SimulatedGame:
+    """A headless stand-in for Minecraft that the capture loop can drive.
+
+    Models the chat line ('/' opens it pre-filled with '/', Ctrl+A selects all,
+    typing replaces a selection), tab completion of /give item IDs from a
+    registry list (Tab applies the selected suggestion, Down moves the
+    selection and wraps around), /give and /clear, and the inventory screen
+    with the same slot grid the pipeline slices. Each item is drawn as a
+    deterministic pixel-art sprite on the slot-grey background.
+
+    Time is virtual: sleep() advances clock() instantly, render_delay is how
+    long the inventory takes to appear after pressing E, and copy_delay how long
+    Ctrl+C takes to reach the clipboard.
+    """
+
+    def __init__(self, item_ids, player_name, hotbar_origin=(1208, 1410), inventory_origin=(1208, 946),
+                 slot_size=(128, 128), slot_pitch=(144, 144), render_delay=0.0, copy_delay=0.0):
+        self.item_ids = sorted(item_ids)
+        self.known_ids = set(self.item_ids)
+        self.player_name = player_name
+        self.hotbar_origin = hotbar_origin
+        self.inventory_origin = inventory_origin
+        self.slot_size = slot_size
+        self.slot_pitch = slot_pitch
+        self.render_delay = render_delay
+        self.copy_delay = copy_delay
+
+        self.chat = None  # Chat line text, None while the chat is closed
+        self.select_all = False
+        self.suggestions = None
+        self.selected = 0
+        self.inventory = [None] * 36
+        self.inventory_opened_at = None
+        self.clipboard = ""
+        self.pending_copy = None  # (time it lands, text) of a Ctrl+C not yet on the clipboard
+        self.now = 0.0
+        self.keystrokes = 0
+        self.sprites = {}
+
+    # Input -------------------------------------------------------------------
+
+    def write(self, text):
+        for char in text:
+            self.keystrokes += 1
+            self._type(char)
+
+    def press(self, key):
+        self.keystrokes += 1
+        if self.chat is None:
+            if key == '/':
+                self.chat = '/'
+                self._end_completion()
+            elif key == 'e':
+                self.inventory_opened_at = None if self.inventory_opened_at is not None else self.now
+            elif key == 'escape':
+                self.inventory_opened_at = None
+            return
+
+        if key == 'tab':
+            self._complete()
+        elif key == 'down':
+            if self.suggestions:
+                self.selected = (self.selected + 1) % len(self.suggestions)
+        elif key == 'ctrl+a':
+            self.select_all = True
+        elif key == 'ctrl+c':
+            if self.select_all:
+                self.pending_copy = (self.now + self.copy_delay, self.chat)
+        elif key == 'backspace':
+            self.chat = '' if self.select_all else self.chat[:-1]
+            self._end_completion()
+        elif key == 'enter':
+            self._run_command(self.chat)
+            self.chat = None
+        elif key == 'escape':
+            self.chat = None
+        elif len(key) == 1:
+            self._type(key)
+
+    def is_pressed(self, key):
+        return False
+
+    def _type(self, char):
+        if self.chat is None:
+            if char == '/':
+                self.chat = '/'
+                self._end_completion()
+            return
+        if self.select_all:
+            self.chat = ''
+        self.chat += char
+        self._end_completion()
+
+    def _end_completion(self):
+        self.select_all = False
+        self.suggestions = None
+        self.selected = 0
+
+    def _give_prefix(self):
+        return f'/give {self.player_name} minecraft:'
+
+    def _complete(self):
+        prefix = self._give_prefix()
+        if self.suggestions is None:
+            if not self.chat.startswith(prefix):
+                return
+            partial = self.chat[len(prefix):]
+            matches = [item_id for item_id in self.item_ids if item_id.startswith(partial)]
+            if not matches:
+                return
+            self.suggestions = matches
+            self.selected = 0
+        self.chat = prefix + self.suggestions[self.selected]
+        self.select_all = False
+
+    def _run_command(self, command):
+        parts = command.split()
+        if len(parts) == 3 and parts[0] == '/give' and parts[1] == self.player_name:
+            item_id = parts[2][len('minecraft:'):] if parts[2].startswith('minecraft:') else parts[2]
+            if item_id in self.known_ids and item_id not in self.inventory and None in self.inventory:
+                self.inventory[self.inventory.index(None)] = item_id
+        elif len(parts) == 2 and parts[0] == '/clear' and parts[1] == self.player_name:
+            self.inventory = [None] * 36
+
+    # Clipboard ---------------------------------------------------------------
+
+    def copy(self, text):
+        # Like the Windows clipboard (pyperclip copies a NUL-terminated string), text ends at the first NUL
+        self.clipboard = text.split('\0', 1)[0]
+
+    def paste(self):
+        if self.pending_copy is not None and self.now >= self.pending_copy[0]:
+            self.clipboard = self.pending_copy[1]
+            self.pending_copy = None
+        return self.clipboard
+
+    # Screen ------------------------------------------------------------------
+
+    def slot_origin(self, slot):
+        """Absolute screen position of an inventory slot (0-8 hotbar, 9-35 main inventory)."""
+        if slot < 9:
+            return (self.hotbar_origin[0] + slot * self.slot_pitch[0], self.hotbar_origin[1])
+        row, column = divmod(slot - 9, 9)
+        return (self.inventory_origin[0] + column * self.slot_pitch[0],
+                self.inventory_origin[1] + row * self.slot_pitch[1])
+
+    def sprite(self, item_id):
+        """Deterministic 16x16 pixel-art sprite for an item, scaled to the slot size."""
+        if item_id not in self.sprites:
+            seed = int.from_bytes(hashlib.sha1(item_id.encode()).digest()[:8], 'big')
+            rng = np.random.default_rng(seed)
+            palette = rng.integers(0, 256, size=(3, 3), dtype=np.uint8)
+            palette[(palette == SLOT_COLOR).all(axis=-1)] = (140, 139, 139)
+            y, x = np.mgrid[0:16, 0:16]
+            blob = (x - 7.5) ** 2 + (y - 7.5) ** 2 <= rng.uniform(20, 56)
+            cells = np.full((16, 16, 3), SLOT_COLOR, dtype=np.uint8)
+            cells[blob] = palette[rng.integers(0, 3, size=int(blob.sum()))]
+            scale = (self.slot_size[1] // 16, self.slot_size[0] // 16)
+            sprite = cells.repeat(scale[0], axis=0).repeat(scale[1], axis=1)
+            canvas = np.full((self.slot_size[1], self.slot_size[0], 3), SLOT_COLOR, dtype=np.uint8)
+            canvas[:sprite.shape[0], :sprite.shape[1]] = sprite
+            self.sprites[item_id] = canvas
+        return self.sprites[item_id]
+
+    def screenshot(self, region):
+        left, top, width, height = region
+        pixels = np.empty((height, width, 3), dtype=np.uint8)
+        pixels[:] = WORLD_COLOR
+        if self.inventory_opened_at is not None and self.now >= self.inventory_opened_at + self.render_delay:
+            for slot, item_id in enumerate(self.inventory):
+                slot_x, slot_y = self.slot_origin(slot)
+                x0, y0 = max(slot_x, left), max(slot_y, top)
+                x1 = min(slot_x + self.slot_size[0], left + width)
+                y1 = min(slot_y + self.slot_size[1], top + height)
+                if x0 >= x1 or y0 >= y1:
+                    continue
+                if item_id is None:
+                    pixels[y0 - top:y1 - top, x0 - left:x1 - left] = SLOT_COLOR
+                else:
+                    pixels[y0 - top:y1 - top, x0 - left:x1 - left] = \
+                        self.sprite(item_id)[y0 - slot_y:y1 - slot_y, x0 - slot_x:x1 - slot_x]
+        return Image.fromarray(pixels)
+
+    # Time --------------------------------------------------------------------
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+    def clock(self):
+        return self.now
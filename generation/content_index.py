@@ -0,0 +1,151 @@
+"""
+Content Hash Index
+
+Keeps a persistent index of item images keyed by a hash of their decoded
+pixel data, and emits gallery-compatible changes.json files from two indexes.
+
+Hashing pixels instead of file bytes means re-encoding a PNG (different zlib
+level, optimizer, metadata) does not show up as a modification.
+
+Index file format (pixel_hashes.json):
+    {"acacia_boat.png": "<sha1 of RGBA pixels>", ...}
+
+Usage:
+    python content_index.py <image_dir> <index_file>
+    python content_index.py <image_dir> <index_file> --previous <old_index_file> --version 1.21.5 --previous-version 1.21.4
+    python content_index.py <image_dir> <index_file> --gallery ../public/images --version 1.21.5 --previous-version 1.21.4
+"""
+
+import os
+import sys
+import json
+import hashlib
+import argparse
+import numpy as np
+from PIL import Image
+from datetime import datetime
+from image_sources import GallerySource, image_name, open_image
+
+INDEX_FILENAME = "pixel_hashes.json"
+CHANGES_FILENAME = "changes.json"
+
+# =============================================================================
+# HASHING
+# =============================================================================
+
+def pixel_hash(image):
+    """Return a hex digest of an image's RGBA pixel data.
+
+    Fully transparent pixels are normalised to (0, 0, 0, 0) first, so tools that
+    rewrite the colour of invisible pixels do not change the hash.
+    """
+    pixels = np.array(image.convert('RGBA'))
+    pixels[pixels[..., 3] == 0] = 0
+    digest = hashlib.sha1()
+    digest.update(f"{pixels.shape[1]}x{pixels.shape[0]}".encode())
+    digest.update(pixels.tobytes())
+    return digest.hexdigest()
+
+def pixel_hash_file(path):
+    """Return the pixel hash of a PNG on disk."""
+    with Image.open(path) as im:
+        return pixel_hash(im)
+
+# =============================================================================
+# INDEX FILES
+# =============================================================================
+
+def load_index(index_file):
+    """Load a pixel hash index, returning an empty one if it does not exist."""
+    if not index_file or not os.path.exists(index_file):
+        return {}
+    with open(index_file, 'r') as f:
+        return json.load(f)
+
+def save_index(index, index_file):
+    """Write a pixel hash index atomically, sorted by filename."""
+    temp_file = f"{index_file}.tmp"
+    with open(temp_file, 'w') as f:
+        json.dump(dict(sorted(index.items())), f, indent=2)
+    os.replace(temp_file, index_file)
+
+def build_index(image_dir):
+    """Hash every PNG in a directory from scratch."""
+    return {
+        filename: pixel_hash_file(os.path.join(image_dir, filename))
+        for filename in sorted(os.listdir(image_dir))
+        if filename.endswith('.png')
+    }
+
+def build_index_from_source(images):
+    """Hash every image yielded by an image_sources iterable (paths or ZIP entries)."""
+    index = {}
+    for image in images:
+        with open_image(image) as im:
+            index[image_name(image)] = pixel_hash(im)
+    return index
+
+def build_gallery_index(images_root, version):
+    """Hash the effective image set of a published gallery version, read from its ZIPs/folders."""
+    return build_index_from_source(GallerySource(images_root).iter_images(version))
+
+# =============================================================================
+# CHANGE DETECTION
+# =============================================================================
+
+def diff_indexes(current, previous):
+    """Compare two indexes and return sorted (added, modified, removed) lists."""
+    added = sorted(name for name in current if name not in previous)
+    modified = sorted(name for name in current if name in previous and previous[name] != current[name])
+    removed = sorted(name for name in previous if name not in current)
+    return added, modified, removed
+
+def build_changes(current, previous, version=None, previous_version=None):
+    """Build a changes.json document in the same layout as public/images/<ver>/changes.json."""
+    added, modified, removed = diff_indexes(current, previous)
+    return {
+        "version": version,
+        "previousVersion": previous_version,
+        "added": added,
+        "modified": modified,
+        "removed": removed,
+        "totalChanges": len(added) + len(modified) + len(removed),
+        "createdAt": datetime.now().isoformat()
+    }
+
+def write_changes(changes_file, current, previous, version=None, previous_version=None):
+    """Diff two indexes, write changes.json and return the changes document."""
+    changes = build_changes(current, previous, version, previous_version)
+    with open(changes_file, 'w') as f:
+        json.dump(changes, f, indent=2)
+    print(f"Changes file created: {changes_file}")
+    print(f"  +{len(changes['added'])} ~{len(changes['modified'])} -{len(changes['removed'])}")
+    return changes
+
+# =============================================================================
+# MAIN SCRIPT
+# =============================================================================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build a pixel hash index and optional changes.json.")
+    parser.add_argument("image_dir", help="Folder of transparent item PNGs")
+    parser.add_argument("index_file", help="Where to write the pixel hash index")
+    parser.add_argument("--previous", help="Index file of the previous version to diff against")
+    parser.add_argument("--gallery", help="Gallery images folder (public/images) to diff --previous-version "
+                                          "against instead of an index file")
+    parser.add_argument("--version", help="Version name recorded in changes.json")
+    parser.add_argument("--previous-version", help="Previous version name recorded in changes.json")
+    parser.add_argument("--changes", help="Where to write changes.json (defaults next to the index)")
+    args = parser.parse_args(argv)
+
+    index = build_index(args.image_dir)
+    save_index(index, args.index_file)
+    print(f"Indexed {len(index)} images into {args.index_file}")
+
+    if args.previous or (args.gallery and args.previous_version):
+        previous = load_index(args.previous) if args.previous else build_gallery_index(args.gallery, args.previous_version)
+        changes_file = args.changes or os.path.join(os.path.dirname(os.path.abspath(args.index_file)), CHANGES_FILENAME)
+        write_changes(changes_file, index, previous, args.version, args.previous_version)
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
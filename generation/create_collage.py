@@ -1,13 +1,28 @@
 import os
 import random
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 from PIL import Image, ImageOps
 import glob
+import numpy as np
+from image_sources import iter_source, open_image, reservoir_sample
+from png_optimizer import PNGStreamWriter
 
 IMAGE_SOURCE_DIR = 'C:/GitHub/MinecraftAllImages/images'
+IMAGE_VERSION = None  # When IMAGE_SOURCE_DIR is a gallery images folder (public/images), the version to draw from
 OUTPUT_WIDTH = 1200
 OUTPUT_HEIGHT = 628
 NUM_IMAGES_TO_PLACE = 1350 # How many random images to attempt to place
 OUTPUT_FILENAME = 'output_collage.png'
+MIN_SCALE = 0.5
+MAX_SCALE = 1.0
+SCALE_STEPS = 4       # Scales are snapped to this many steps between MIN_SCALE and MAX_SCALE
+ANGLE_STEPS = 24      # Rotations are snapped to 360 / ANGLE_STEPS degree steps
+SPRITE_CACHE_MB = 256 # Memory cap for decoded and scaled source sprites
+ATLAS_CACHE_MB = 512  # Memory cap for scaled + rotated sprites
+TILE_SIZE = 512       # Edge length of the canvas tiles composited in parallel
+COLLAGE_WORKERS = 1   # Processes used for tiled composition; 1 renders the whole canvas serially
+SEED = None           # Fixed seed for a reproducible layout
 # --- End Configuration ---
 
 def find_image_files(directory):
@@ -16,68 +31,256 @@ def find_image_files(directory):
     print(f"Found {len(png_files)} PNG files in '{directory}'.")
     return png_files
 
-def create_collage(image_paths, width, height, num_images, output_filename):
-    """Creates a collage by randomly placing, rotating, and scaling images."""
-    if not image_paths:
-        print("Error: No image files found.")
-        return
+class LRUImageCache:
+    """Least-recently-used cache of 4-channel images capped by their decoded size in bytes."""
+
+    def __init__(self, max_mb):
+        self.max_bytes = max_mb * 1024 * 1024
+        self.images = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
 
-    # Create a blank canvas with transparency
-    collage = Image.new('RGBA', (width, height), (0, 0, 0, 0))
+    def get(self, key, create):
+        """Return the cached image for key, calling create() to build it on a miss."""
+        if key in self.images:
+            self.images.move_to_end(key)
+            self.hits += 1
+            return self.images[key]
+        self.misses += 1
+        image = create()
+        self.images[key] = image
+        self.bytes += image.width * image.height * 4
+        while self.bytes > self.max_bytes and len(self.images) > 1:
+            _, evicted = self.images.popitem(last=False)
+            self.bytes -= evicted.width * evicted.height * 4
+        return image
 
-    # Select random images
-    selected_paths = random.sample(image_paths, min(num_images, len(image_paths)))
-    print(f"Selected {len(selected_paths)} images for the collage.")
+class CollageRenderer:
+    """Renders collages from a shared pool of decoded and pre-transformed sprites.
 
-    images_processed = 0
-    for img_path in selected_paths:
-        try:
-            # Open image
-            img = Image.open(img_path).convert('RGBA')
+    Each source image is decoded once into the sprite cache. Scales and angles
+    are snapped to SCALE_STEPS x ANGLE_STEPS steps, so each scaled sprite and
+    each (image, scale, angle) combination is built once and then reused by
+    every later placement and every later collage (other versions, categories
+    or output sizes). Sprites are kept alpha-premultiplied until the final
+    rotation so Pillow does not convert them for every resize and rotate.
+    """
 
-            # Random scale factor (e.g., 0.5x to 1.5x)
-            scale_factor = random.uniform(0.5, 1.0)
-            new_size = (int(img.width * scale_factor), int(img.height * scale_factor))
+    def __init__(self, sprite_cache_mb=SPRITE_CACHE_MB, atlas_cache_mb=ATLAS_CACHE_MB,
+                 scale_steps=SCALE_STEPS, angle_steps=ANGLE_STEPS):
+        self.sprites = LRUImageCache(sprite_cache_mb)
+        self.atlas = LRUImageCache(atlas_cache_mb)
+        self.scale_steps = scale_steps
+        self.angle_steps = angle_steps
+        self.sizes = {}
+        # Constructor arguments, so worker processes can build an identical renderer
+        self.settings = (sprite_cache_mb, atlas_cache_mb, scale_steps, angle_steps)
+
+    def sprite(self, img_path):
+        """Decoded source image, alpha-premultiplied."""
+        def load():
+            with open_image(img_path) as img:
+                return img.convert('RGBA').convert('RGBa')
+        return self.sprites.get((img_path, None), load)
+
+    def scaled(self, img_path, scale_step):
+        """Source image resized to a quantized scale step, alpha-premultiplied."""
+        def scale():
+            img = self.sprite(img_path)
+            scale_factor = MIN_SCALE + (MAX_SCALE - MIN_SCALE) * scale_step / max(1, self.scale_steps - 1)
             # Ensure size is at least 1x1 pixel after scaling
-            new_size = (max(1, new_size[0]), max(1, new_size[1]))
+            new_size = (max(1, int(img.width * scale_factor)), max(1, int(img.height * scale_factor)))
+            return img.resize(new_size, Image.Resampling.LANCZOS)
+        return self.sprites.get((img_path, scale_step), scale)
+
+    def scale_step(self, scale_factor):
+        return round((scale_factor - MIN_SCALE) / (MAX_SCALE - MIN_SCALE) * (self.scale_steps - 1))
 
-            if new_size[0] > 0 and new_size[1] > 0: # Ensure valid size
-                img_resized = img.resize(new_size, Image.Resampling.LANCZOS)
+    def angle_step(self, rotation_angle):
+        return round(rotation_angle / 360 * self.angle_steps) % self.angle_steps
 
-                # Random rotation (0-360 degrees)
-                rotation_angle = random.uniform(0, 360)
-                # Use expand=True to prevent cropping during rotation
-                img_rotated = img_resized.rotate(rotation_angle, Image.Resampling.BICUBIC, expand=True)
+    def transformed(self, img_path, scale_step, angle_step):
+        """Source image scaled and rotated to a quantized (scale, angle) step."""
+        def transform():
+            img_resized = self.scaled(img_path, scale_step)
+            # Use expand=True to prevent cropping during rotation
+            img_rotated = img_resized.rotate(angle_step * 360 / self.angle_steps, Image.Resampling.BICUBIC, expand=True)
+            return img_rotated.convert('RGBA')
+        return self.atlas.get((img_path, scale_step, angle_step), transform)
+
+    def source_size(self, img_path):
+        """Width and height of a source image, read from its header without decoding."""
+        key = ('size', img_path)
+        if key not in self.sizes:
+            with open_image(img_path) as img:
+                self.sizes[key] = img.size
+        return self.sizes[key]
+
+    def transformed_size(self, img_path, scale_step, angle_step):
+        """Size of transformed(img_path, scale_step, angle_step) without rendering the sprite."""
+        width, height = self.source_size(img_path)
+        scale_factor = MIN_SCALE + (MAX_SCALE - MIN_SCALE) * scale_step / max(1, self.scale_steps - 1)
+        scaled_size = (max(1, int(width * scale_factor)), max(1, int(height * scale_factor)))
+        key = (scaled_size, angle_step)
+        if key not in self.sizes:
+            # Rotating a blank image of the same size gives Pillow's exact expand=True size
+            blank = Image.new('L', scaled_size)
+            self.sizes[key] = blank.rotate(angle_step * 360 / self.angle_steps, expand=True).size
+        return self.sizes[key]
+
+    def plan(self, image_paths, width, height, num_images, rng=random):
+        """Pick every placement up front as (img_path, scale_step, angle_step, x, y, width, height).
+
+        image_paths may be a list or any iterable of paths / image_sources entries;
+        iterables are reservoir-sampled so the full catalog is never materialised.
+        """
+        # Select random images
+        if isinstance(image_paths, (list, tuple)):
+            selected_paths = rng.sample(image_paths, min(num_images, len(image_paths)))
+        else:
+            selected_paths = reservoir_sample(image_paths, num_images, rng)
+        print(f"Selected {len(selected_paths)} images for the collage.")
+
+        placements = []
+        for img_path in selected_paths:
+            try:
+                # Random scale factor and rotation, snapped to the atlas steps
+                scale_step = self.scale_step(rng.uniform(MIN_SCALE, MAX_SCALE))
+                angle_step = self.angle_step(rng.uniform(0, 360))
+                sprite_width, sprite_height = self.transformed_size(img_path, scale_step, angle_step)
 
                 # Random position
                 # Allow images to be placed partially off-canvas
                 max_x = width - 1
                 max_y = height - 1
                 # Adjust placement range to allow partial off-screen placement
-                paste_x = random.randint(-img_rotated.width // 2, max_x - img_rotated.width // 2)
-                paste_y = random.randint(-img_rotated.height // 2, max_y - img_rotated.height // 2)
+                paste_x = rng.randint(-sprite_width // 2, max_x - sprite_width // 2)
+                paste_y = rng.randint(-sprite_height // 2, max_y - sprite_height // 2)
+                placements.append((img_path, scale_step, angle_step, paste_x, paste_y, sprite_width, sprite_height))
+            except Exception as e:
+                print(f"Warning: Could not process image {img_path}. Error: {e}")
+        return placements
 
+    def compose(self, placements, box):
+        """Paste placements, in order, onto a transparent canvas covering box (left, top, right, bottom)."""
+        left, top, right, bottom = box
+        canvas = Image.new('RGBA', (right - left, bottom - top), (0, 0, 0, 0))
+        images_processed = 0
+        for img_path, scale_step, angle_step, paste_x, paste_y, _, _ in placements:
+            try:
+                img_rotated = self.transformed(img_path, scale_step, angle_step)
                 # Paste the image using its alpha channel as a mask
-                collage.paste(img_rotated, (paste_x, paste_y), img_rotated)
+                canvas.paste(img_rotated, (paste_x - left, paste_y - top), img_rotated)
                 images_processed += 1
-            else:
-                 print(f"Skipping {img_path} due to invalid size after scaling.")
+            except Exception as e:
+                print(f"Warning: Could not process image {img_path}. Error: {e}")
+        return canvas, images_processed
+
+    def render(self, image_paths, width, height, num_images, rng=random):
+        """Place num_images random sprites on a transparent canvas. Returns (collage, images placed)."""
+        placements = self.plan(image_paths, width, height, num_images, rng)
+        return self.compose(placements, (0, 0, width, height))
+
+    def render_tiled(self, image_paths, width, height, num_images, output_filename, rng=random,
+                     tile_size=TILE_SIZE, workers=None):
+        """Like render(), but composites tile_size tiles in a process pool and streams them to a PNG.
 
+        Each tile only receives the placements overlapping it, in their original
+        order, and pasting with an alpha mask is a per-pixel operation, so the
+        pixels are bit-identical to render() for the same rng state. The full
+        canvas is never held in memory: each row of tiles is stitched into one
+        band and written to output_filename with png_optimizer.PNGStreamWriter
+        while the next row renders. Returns the number of images placed; nothing
+        is written when there are none.
+        """
+        placements = self.plan(image_paths, width, height, num_images, rng)
+        if not placements:
+            return 0
 
-        except Exception as e:
-            print(f"Warning: Could not process image {img_path}. Error: {e}")
+        # Bin placements into the tiles their bounding box overlaps
+        tiles = {}
+        for placement in placements:
+            paste_x, paste_y, sprite_width, sprite_height = placement[3:]
+            first_column, last_column = max(0, paste_x) // tile_size, min(width - 1, paste_x + sprite_width - 1) // tile_size
+            first_row, last_row = max(0, paste_y) // tile_size, min(height - 1, paste_y + sprite_height - 1) // tile_size
+            for row in range(first_row, last_row + 1):
+                for column in range(first_column, last_column + 1):
+                    tiles.setdefault((row, column), []).append(placement)
+
+        bands = []
+        for top in range(0, height, tile_size):
+            bottom = min(top + tile_size, height)
+            row = top // tile_size
+            bands.append([((left, top, min(left + tile_size, width), bottom), tiles[(row, left // tile_size)])
+                          for left in range(0, width, tile_size) if (row, left // tile_size) in tiles])
+
+        with ProcessPoolExecutor(max_workers=workers) as executor, open(output_filename, 'wb') as f:
+            writer = PNGStreamWriter(f, width, height)
+            # Keep one row of tiles rendering ahead of the one being written
+            pending = [executor.submit(render_tile, (self.settings,) + task) for task in bands[0]]
+            for index, top in enumerate(range(0, height, tile_size)):
+                current = pending
+                pending = [executor.submit(render_tile, (self.settings,) + task) for task in bands[index + 1]] \
+                    if index + 1 < len(bands) else []
+                band = Image.new('RGBA', (width, min(tile_size, height - top)), (0, 0, 0, 0))
+                for future in current:
+                    box, data = future.result()
+                    band.paste(Image.frombytes('RGBA', (box[2] - box[0], box[3] - box[1]), data), (box[0], 0))
+                writer.write_rows(np.asarray(band))
+            writer.close()
+        return len(placements)
+
+# Shared by every create_collage() call in this process so repeated collages reuse sprites
+default_renderer = CollageRenderer()
+
+# Worker-process renderers by settings, so tiles render with the same steps as the planning renderer
+_tile_renderers = {default_renderer.settings: default_renderer}
+
+def render_tile(task):
+    """Composite one canvas tile with a renderer built from the given settings (runs in a worker process)."""
+    settings, box, placements = task
+    if settings not in _tile_renderers:
+        _tile_renderers[settings] = CollageRenderer(*settings)
+    tile, _ = _tile_renderers[settings].compose(placements, box)
+    return box, tile.tobytes()
+
+def create_collage(image_paths, width, height, num_images, output_filename, renderer=None,
+                   seed=SEED, workers=COLLAGE_WORKERS):
+    """Creates a collage by randomly placing, rotating, and scaling images.
+
+    A seed makes the layout reproducible; workers > 1 composites the canvas in
+    parallel tiles with the same result as the serial path.
+    """
+    if not image_paths:
+        print("Error: No image files found.")
+        return
+
+    renderer = renderer or default_renderer
+    rng = random.Random(seed) if seed is not None else random
+    if workers > 1:
+        # Streams the collage to output_filename tile row by tile row
+        images_processed = renderer.render_tiled(image_paths, width, height, num_images, output_filename, rng,
+                                                 workers=workers)
+    else:
+        collage, images_processed = renderer.render(image_paths, width, height, num_images, rng)
+        if images_processed > 0:
+            # Save the final collage
+            collage.save(output_filename)
 
     if images_processed > 0:
-        # Save the final collage
-        collage.save(output_filename)
         print(f"\nCollage saved as '{output_filename}'")
     else:
         print("\nNo images were successfully processed. Collage not saved.")
 
 
 if __name__ == "__main__":
-    all_images = find_image_files(IMAGE_SOURCE_DIR)
+    if os.path.isdir(IMAGE_SOURCE_DIR) and not IMAGE_VERSION:
+        all_images = find_image_files(IMAGE_SOURCE_DIR)
+    else:
+        # Gallery version or release ZIP: stream the images without extracting them
+        all_images = iter_source(IMAGE_SOURCE_DIR, IMAGE_VERSION)
     if all_images:
         create_collage(all_images, OUTPUT_WIDTH, OUTPUT_HEIGHT, NUM_IMAGES_TO_PLACE, OUTPUT_FILENAME)
     else:
-        print(f"No PNG images found in '{IMAGE_SOURCE_DIR}' or its subdirectories.") 
+        print(f"No PNG images found in '{IMAGE_SOURCE_DIR}' or its subdirectories.")
@@ -0,0 +1,167 @@
+"""
+Derivative Generator
+
+Produces every configured size of each transparent item image - thumbnails,
+2x/3x retina upscales, collage sprites - from a single decode per source.
+
+- Upscales use nearest-neighbour, so pixel art stays crisp.
+- Downscales use area averaging (BOX) on alpha-premultiplied pixels, so
+  transparent edges do not pick up dark fringes.
+
+Sources are processed in a process pool. A state file records each source's
+size, mtime and content hash, so only items whose source changed (or whose
+derivatives are missing) are regenerated; changing DERIVATIVE_SIZES
+regenerates everything.
+
+Output layout:
+    <out_dir>/32/stone.png
+    <out_dir>/256/stone.png
+    ...
+
+Usage:
+    python derivatives.py transparent_images derivatives
+    python derivatives.py ../public/images/1.21.10 derivatives --sizes 32 64 256 --optimize
+"""
+
+import io
+import os
+import sys
+import json
+import hashlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from PIL import Image
+
+from png_optimizer import optimize_png
+
+DERIVATIVE_SIZES = [32, 64, 256, 384]  # Square output sizes in pixels; each gets its own folder
+DERIVATIVE_WORKERS = os.cpu_count() or 1
+DERIVATIVES_STATE_FILE = "derivatives_state.json"
+
+# =============================================================================
+# RESIZING
+# =============================================================================
+
+def resize_sprite(image, size):
+    """Resize an RGBA sprite to size x size: nearest-neighbour up, premultiplied area averaging down."""
+    if image.size == (size, size):
+        return image
+    if size >= max(image.size):
+        return image.resize((size, size), Image.Resampling.NEAREST)
+    premultiplied = image.convert('RGBa').resize((size, size), Image.Resampling.BOX)
+    return premultiplied.convert('RGBA')
+
+def generate_derivatives(task):
+    """Write every size of one source image (runs in a worker process). Returns (filename, bytes written)."""
+    filename, source_path, out_dir, sizes, optimize = task
+    with Image.open(source_path) as im:
+        image = im.convert('RGBA')
+    written = 0
+    for size in sizes:
+        buffer = io.BytesIO()
+        resize_sprite(image, size).save(buffer, 'PNG')
+        data = optimize_png(buffer.getvalue()) if optimize else buffer.getvalue()
+        path = os.path.join(out_dir, str(size), filename)
+        temp_path = f"{path}.tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, path)
+        written += len(data)
+    return filename, written
+
+# =============================================================================
+# STATE
+# =============================================================================
+
+def load_state(state_file):
+    if not state_file or not os.path.exists(state_file):
+        return {}
+    with open(state_file, 'r') as f:
+        return json.load(f)
+
+def save_state(state, state_file):
+    temp_file = f"{state_file}.tmp"
+    with open(temp_file, 'w') as f:
+        json.dump(state, f, indent=2)
+    os.replace(temp_file, state_file)
+
+def file_hash(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+# =============================================================================
+# DERIVATIVE STAGE
+# =============================================================================
+
+def build_derivatives(source_dir, out_dir, state_file=None, sizes=None, workers=DERIVATIVE_WORKERS, optimize=False):
+    """Regenerate the derivatives of every new or changed PNG in source_dir. Returns the number regenerated."""
+    sizes = sorted(sizes or DERIVATIVE_SIZES)
+    state_file = state_file or os.path.join(out_dir, DERIVATIVES_STATE_FILE)
+    for size in sizes:
+        os.makedirs(os.path.join(out_dir, str(size)), exist_ok=True)
+
+    state = load_state(state_file)
+    settings = {"sizes": sizes, "optimize": optimize}
+    if state.get("settings") != settings:
+        state = {"settings": settings, "files": {}}
+    known = state["files"]
+
+    tasks = []
+    current = {}
+    for entry in os.scandir(source_dir):
+        if not entry.name.endswith('.png'):
+            continue
+        stat = entry.stat()
+        previous = known.get(entry.name)
+        outputs_exist = all(os.path.exists(os.path.join(out_dir, str(size), entry.name)) for size in sizes)
+        if previous and outputs_exist and previous["mtime"] == stat.st_mtime_ns and previous["size"] == stat.st_size:
+            current[entry.name] = previous
+            continue
+        # Touched but identical sources keep their derivatives; only the stat is refreshed
+        digest = file_hash(entry.path)
+        current[entry.name] = {"mtime": stat.st_mtime_ns, "size": stat.st_size, "hash": digest}
+        if previous and outputs_exist and previous["hash"] == digest:
+            continue
+        tasks.append((entry.name, entry.path, out_dir, sizes, optimize))
+
+    written = 0
+    if tasks:
+        workers = max(1, min(workers, len(tasks)))
+        if workers == 1:
+            results = list(map(generate_derivatives, tasks))
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                chunksize = max(1, len(tasks) // (workers * 4))
+                results = list(executor.map(generate_derivatives, tasks, chunksize=chunksize))
+        written = sum(size for _, size in results)
+
+    # Remove derivatives of sources that no longer exist
+    for filename in known:
+        if filename not in current:
+            for size in sizes:
+                path = os.path.join(out_dir, str(size), filename)
+                if os.path.exists(path):
+                    os.remove(path)
+    state["files"] = current
+    save_state(state, state_file)
+    print(f"Derivatives: {len(tasks)} of {len(current)} images regenerated at sizes {sizes} "
+          f"({written / 1024:.1f} KB written)")
+    return len(tasks)
+
+# =============================================================================
+# MAIN SCRIPT
+# =============================================================================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate resized copies of item images, incrementally.")
+    parser.add_argument("source_dir", help="Folder of transparent item PNGs")
+    parser.add_argument("out_dir", help="Where the <size>/ folders are written")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DERIVATIVE_SIZES)
+    parser.add_argument("--state", help="State file (defaults to <out_dir>/derivatives_state.json)")
+    parser.add_argument("--workers", type=int, default=DERIVATIVE_WORKERS)
+    parser.add_argument("--optimize", action="store_true", help="Run png_optimizer on every derivative")
+    args = parser.parse_args(argv)
+    build_derivatives(args.source_dir, args.out_dir, args.state, args.sizes, args.workers, args.optimize)
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,223 @@
+"""
+Image Sources
+
+Streams item images straight from the files the gallery already ships -
+public/images/<ver>.zip (or the extracted <ver>/ folders) and
+releases/minecraft-items-<ver>.zip - without extracting anything to disk.
+
+The base version holds the full set, and every later version only ships the
+files listed as added/modified in its changes.json. The effective image set
+of a version is the base manifest with each changes.json in the chain applied
+in order, every name resolving to the newest version that supplied it. Only
+the small JSON files are read to resolve a set; image bytes are read from the
+folder or ZIP member when an image is opened.
+
+reservoir_sample() picks N random images in one pass, so sampling never holds
+the whole catalog in memory.
+
+Usage:
+    python image_sources.py ../public/images 1.16.5
+    python image_sources.py ../public/images 1.16.5 --sample 20 --seed 1
+    python image_sources.py ../releases/minecraft-items-1.16.5.zip --sample 5
+"""
+
+import io
+import os
+import sys
+import json
+import random
+import zipfile
+import argparse
+from collections import namedtuple
+from PIL import Image
+
+VERSIONS_FILENAME = "versions.json"
+EXCLUDED_IMAGES = {"x.png", "u.png"}  # Placeholders the site filters out as well
+
+# name: item file name, version: version that supplied it,
+# archive: ZIP path or None, member: path inside the ZIP, or the file path when archive is None
+ImageEntry = namedtuple("ImageEntry", ["name", "version", "archive", "member"])
+
+# =============================================================================
+# READING IMAGES
+# =============================================================================
+
+# Open ZIP handles, one per archive per process. Keyed by pid because forked pool
+# workers inherit this dict, and a handle shared across processes shares its file offset.
+_archives = {}
+
+def _archive(path):
+    key = (os.getpid(), path)
+    if key not in _archives:
+        _archives[key] = zipfile.ZipFile(path)
+    return _archives[key]
+
+def image_name(source):
+    """Item file name of a path or ImageEntry."""
+    return source.name if isinstance(source, ImageEntry) else os.path.basename(source)
+
+def read_bytes(source):
+    """Raw PNG bytes of a path or ImageEntry."""
+    if isinstance(source, ImageEntry):
+        if source.archive is None:
+            source = source.member
+        else:
+            return _archive(source.archive).read(source.member)
+    with open(source, 'rb') as f:
+        return f.read()
+
+def open_image(source):
+    """Open a path or ImageEntry as a PIL image (decoded lazily, like Image.open)."""
+    if isinstance(source, ImageEntry):
+        if source.archive is None:
+            return Image.open(source.member)
+        return Image.open(io.BytesIO(read_bytes(source)))
+    return Image.open(source)
+
+# =============================================================================
+# SOURCES
+# =============================================================================
+
+def iter_directory(directory):
+    """Yield the path of every .png under a folder, recursively."""
+    for root, dirs, files in os.walk(directory):
+        dirs.sort()
+        for filename in sorted(files):
+            if filename.endswith('.png'):
+                yield os.path.join(root, filename)
+
+def iter_manifest(directory, manifest_file):
+    """Yield the path of every image a pipeline manifest.json lists that exists in directory."""
+    with open(manifest_file, 'r') as f:
+        manifest = json.load(f)
+    for filename in manifest["images"]:
+        path = os.path.join(directory, filename)
+        if os.path.exists(path):
+            yield path
+
+def iter_release(zip_path):
+    """Yield an ImageEntry for every .png in a release ZIP (flat or version-prefixed)."""
+    version = os.path.splitext(os.path.basename(zip_path))[0].replace("minecraft-items-", "")
+    for member in _archive(zip_path).namelist():
+        name = member.rsplit('/', 1)[-1]
+        if name.endswith('.png') and name not in EXCLUDED_IMAGES:
+            yield ImageEntry(name, version, zip_path, member)
+
+class GallerySource:
+    """The versions of a gallery images folder (public/images or public/images-v2)."""
+
+    def __init__(self, images_root):
+        self.images_root = images_root
+        with open(os.path.join(images_root, VERSIONS_FILENAME), 'r') as f:
+            versions = json.load(f)
+        self.base = versions["base"]
+        # versions.json lists the newest version first
+        self.versions = list(reversed(versions["versions"]))
+        self.resolved = {}
+
+    def chain(self, version):
+        """Versions from the base up to and including version."""
+        if version not in self.versions:
+            raise ValueError(f"Unknown version {version!r} in {self.images_root}")
+        return self.versions[self.versions.index(self.base):self.versions.index(version) + 1]
+
+    def read_json(self, version, filename):
+        """A version's manifest.json / changes.json from its folder or ZIP, or None if it has none."""
+        path = os.path.join(self.images_root, version, filename)
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                return json.load(f)
+        zip_path = os.path.join(self.images_root, f"{version}.zip")
+        if os.path.exists(zip_path):
+            try:
+                return json.loads(_archive(zip_path).read(f"{version}/{filename}"))
+            except KeyError:
+                pass
+        return None
+
+    def resolve(self, version):
+        """Map every image name in a version's effective set to the version that supplied it."""
+        if version in self.resolved:
+            return self.resolved[version]
+        chain = self.chain(version)
+        if len(chain) > 1:
+            images = dict(self.resolve(chain[-2]))
+            changes = self.read_json(version, "changes.json") or {}
+            for name in changes.get("removed", []):
+                images.pop(name, None)
+            for name in changes.get("added", []) + changes.get("modified", []):
+                if name not in EXCLUDED_IMAGES:
+                    images[name] = version
+        else:
+            manifest = self.read_json(version, "manifest.json")
+            if manifest is None:
+                raise FileNotFoundError(f"manifest.json not found for base version {version}")
+            images = {name: version for name in manifest["images"] if name not in EXCLUDED_IMAGES}
+        self.resolved[version] = images
+        return images
+
+    def entry(self, name, version):
+        """Where to read one image: the extracted folder if present, otherwise the version's ZIP."""
+        path = os.path.join(self.images_root, version, name)
+        if os.path.exists(path):
+            return ImageEntry(name, version, None, path)
+        return ImageEntry(name, version, os.path.join(self.images_root, f"{version}.zip"), f"{version}/{name}")
+
+    def iter_images(self, version):
+        """Yield an ImageEntry for every image in a version's effective set, sorted by name."""
+        images = self.resolve(version)
+        for name in sorted(images):
+            yield self.entry(name, images[name])
+
+def iter_source(source, version=None):
+    """Yield images from a gallery images folder (needs version), a release ZIP or a plain folder."""
+    if os.path.isfile(source) and source.endswith('.zip'):
+        return iter_release(source)
+    if os.path.exists(os.path.join(source, VERSIONS_FILENAME)):
+        gallery = GallerySource(source)
+        return gallery.iter_images(version or gallery.versions[-1])
+    return iter_directory(source)
+
+# =============================================================================
+# SAMPLING
+# =============================================================================
+
+def reservoir_sample(items, k, rng=random):
+    """Pick k random items from an iterable of unknown length in one pass (Algorithm R)."""
+    sample = []
+    for i, item in enumerate(items):
+        if i < k:
+            sample.append(item)
+        else:
+            j = rng.randrange(i + 1)
+            if j < k:
+                sample[j] = item
+    rng.shuffle(sample)
+    return sample
+
+# =============================================================================
+# MAIN SCRIPT
+# =============================================================================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="List or sample the images of a gallery version, release ZIP or folder.")
+    parser.add_argument("source", help="Gallery images folder (public/images), release ZIP or image folder")
+    parser.add_argument("version", nargs="?", help="Version to resolve in a gallery images folder (defaults to the newest)")
+    parser.add_argument("--sample", type=int, help="Only print this many random images")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args(argv)
+
+    images = iter_source(args.source, args.version)
+    if args.sample is not None:
+        images = reservoir_sample(images, args.sample, random.Random(args.seed))
+    count = 0
+    for image in images:
+        if isinstance(image, ImageEntry):
+            print(f"{image.name}\t{image.version}\t{image.archive or image.member}")
+        else:
+            print(image)
+        count += 1
+    print(f"{count} images", file=sys.stderr)
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,370 @@
+"""
+Content-Addressed Image Store
+
+Deduplicates item PNGs across gallery versions and release ZIPs. Every
+distinct image is stored once as a blob named by its pixel hash (see
+content_index.py), and each ingested version gets a small manifest mapping
+item names to blob hashes. Any ingested version's folder or ZIP can be
+rebuilt from the store, and versions can be diffed on hashes alone.
+
+Blobs keep the PNG bytes of the first copy seen, so rebuilt images are
+pixel-identical to the originals but not necessarily byte-identical.
+
+Store layout:
+    <store>/blobs/ab/ab12...ef.png       one PNG per distinct pixel hash
+    <store>/manifests/<name>.json        one per ingested folder/ZIP
+
+Manifest format:
+    {
+      "name": "1.14.4",                  public/images/1.14.4(.zip), or "minecraft-items-1.14.4"
+      "version": "1.14.4",
+      "layout": "gallery" | "flat",      gallery ZIPs prefix members with "<version>/"
+      "files": {"stone.png": "<hash>"},  images shipped in this folder/ZIP
+      "images": {"stone.png": "<hash>"}, effective image set of the version
+      "documents": {"manifest.json": {...}, "changes.json": {...}},
+      "source": {"path": ..., "signature": ...},
+      "createdAt": ...
+    }
+
+Usage:
+    python image_store.py ingest <store> ../public/images
+    python image_store.py ingest <store> ../releases/minecraft-items-1.21.5.zip
+    python image_store.py rebuild <store> 1.14.4 --zip out/1.14.4.zip
+    python image_store.py rebuild <store> 1.14.4 --folder out/1.14.4
+    python image_store.py diff <store> 1.21.4 1.21.5 --changes changes.json
+    python image_store.py stats <store>
+"""
+
+import io
+import os
+import sys
+import json
+import hashlib
+import zipfile
+import argparse
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+from PIL import Image
+
+from content_index import pixel_hash, build_changes
+from image_sources import GallerySource, VERSIONS_FILENAME, EXCLUDED_IMAGES
+
+BLOBS_DIRNAME = "blobs"
+MANIFESTS_DIRNAME = "manifests"
+HASH_WORKERS = None  # Processes used to hash PNGs; None uses every CPU core
+HASH_CHUNK_SIZE = 64 # PNGs sent to a worker at a time
+
+# =============================================================================
+# HASHING
+# =============================================================================
+
+def hash_png(data):
+    """Pixel hash of PNG bytes (runs in a worker process)."""
+    with Image.open(io.BytesIO(data)) as im:
+        return pixel_hash(im)
+
+def hash_pngs(files, workers=HASH_WORKERS):
+    """Pixel-hash a {name: png bytes} dict in a process pool, returning {name: hash}."""
+    names = list(files)
+    if len(names) < HASH_CHUNK_SIZE:
+        return {name: hash_png(files[name]) for name in names}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        hashes = executor.map(hash_png, (files[name] for name in names), chunksize=HASH_CHUNK_SIZE)
+        return dict(zip(names, hashes))
+
+# =============================================================================
+# STORE
+# =============================================================================
+
+class ImageStore:
+    """A folder of pixel-hash-addressed PNG blobs plus per-version manifests."""
+
+    def __init__(self, root):
+        self.root = root
+        self.blobs_dir = os.path.join(root, BLOBS_DIRNAME)
+        self.manifests_dir = os.path.join(root, MANIFESTS_DIRNAME)
+        os.makedirs(self.blobs_dir, exist_ok=True)
+        os.makedirs(self.manifests_dir, exist_ok=True)
+
+    # Blobs -------------------------------------------------------------------
+
+    def blob_path(self, digest):
+        return os.path.join(self.blobs_dir, digest[:2], f"{digest}.png")
+
+    def has_blob(self, digest):
+        return os.path.exists(self.blob_path(digest))
+
+    def put_blob(self, digest, data):
+        """Store PNG bytes under their pixel hash unless an identical image is already stored."""
+        path = self.blob_path(digest)
+        if os.path.exists(path):
+            return False
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, path)
+        return True
+
+    def read_blob(self, digest):
+        with open(self.blob_path(digest), 'rb') as f:
+            return f.read()
+
+    # Manifests ---------------------------------------------------------------
+
+    def manifest_path(self, name):
+        return os.path.join(self.manifests_dir, f"{name}.json")
+
+    def load_manifest(self, name):
+        path = self.manifest_path(name)
+        if not os.path.exists(path):
+            return None
+        with open(path, 'r') as f:
+            return json.load(f)
+
+    def save_manifest(self, manifest):
+        path = self.manifest_path(manifest["name"])
+        temp_path = f"{path}.tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(temp_path, path)
+
+    def manifest_names(self):
+        return sorted(name[:-len(".json")] for name in os.listdir(self.manifests_dir) if name.endswith(".json"))
+
+    # Ingest ------------------------------------------------------------------
+
+    def add_files(self, files, known=None, workers=HASH_WORKERS):
+        """Hash and store a {name: png bytes} dict, returning {name: hash} and the number of new blobs.
+
+        known maps PNG byte digests to pixel hashes from earlier ingests, so
+        byte-identical copies are not decoded again.
+        """
+        known = {} if known is None else known
+        byte_digests = {name: hashlib.sha1(data).hexdigest() for name, data in files.items()}
+        to_hash = {name: data for name, data in files.items() if byte_digests[name] not in known}
+        for name, digest in hash_pngs(to_hash, workers).items():
+            known[byte_digests[name]] = digest
+        hashes = {name: known[byte_digests[name]] for name in sorted(files)}
+        new_blobs = sum(self.put_blob(hashes[name], files[name]) for name in hashes)
+        return hashes, new_blobs
+
+    def ingest(self, name, version, layout, files, images=None, documents=None, source=None,
+               known=None, workers=HASH_WORKERS):
+        """Store one folder/ZIP's images and write its manifest."""
+        hashes, new_blobs = self.add_files(files, known, workers)
+        manifest = {
+            "name": name,
+            "version": version,
+            "layout": layout,
+            "files": hashes,
+            "images": hashes if images is None else images(hashes),
+            "documents": documents or {},
+            "source": source or {},
+            "createdAt": datetime.now().isoformat()
+        }
+        self.save_manifest(manifest)
+        print(f"Ingested {name}: {len(hashes)} files, {new_blobs} new blobs")
+        return manifest
+
+    # Rebuild -----------------------------------------------------------------
+
+    def rebuild_folder(self, name, out_dir):
+        """Write an ingested version's images and JSON documents to a folder."""
+        manifest = self.load_manifest(name)
+        if manifest is None:
+            raise KeyError(f"No manifest named {name!r} in {self.root}")
+        os.makedirs(out_dir, exist_ok=True)
+        for filename, digest in manifest["files"].items():
+            with open(os.path.join(out_dir, filename), 'wb') as f:
+                f.write(self.read_blob(digest))
+        for filename, document in manifest["documents"].items():
+            with open(os.path.join(out_dir, filename), 'w') as f:
+                json.dump(document, f, indent=2)
+        print(f"Rebuilt {name} into {out_dir} ({len(manifest['files'])} files)")
+
+    def rebuild_zip(self, name, zip_path):
+        """Write an ingested version's ZIP in its original layout."""
+        manifest = self.load_manifest(name)
+        if manifest is None:
+            raise KeyError(f"No manifest named {name!r} in {self.root}")
+        prefix = f"{manifest['version']}/" if manifest["layout"] == "gallery" else ""
+        os.makedirs(os.path.dirname(os.path.abspath(zip_path)), exist_ok=True)
+        with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zf:
+            if prefix:
+                zf.writestr(prefix, b"")
+            for filename, digest in manifest["files"].items():
+                zf.writestr(prefix + filename, self.read_blob(digest))
+            for filename, document in manifest["documents"].items():
+                zf.writestr(prefix + filename, json.dumps(document, indent=2))
+        print(f"Rebuilt {name} into {zip_path} ({len(manifest['files'])} files)")
+
+    # Queries -----------------------------------------------------------------
+
+    def diff(self, old_name, new_name):
+        """changes.json document between the effective image sets of two ingested versions."""
+        old, new = self.load_manifest(old_name), self.load_manifest(new_name)
+        return build_changes(new["images"], old["images"], new["version"], old["version"])
+
+    def stats(self):
+        """Bytes referenced by all manifests vs bytes actually stored."""
+        referenced = 0
+        sizes = {}
+        for name in self.manifest_names():
+            for digest in self.load_manifest(name)["files"].values():
+                if digest not in sizes:
+                    sizes[digest] = os.path.getsize(self.blob_path(digest))
+                referenced += sizes[digest]
+        return {"manifests": len(self.manifest_names()), "blobs": len(sizes),
+                "referencedBytes": referenced, "storedBytes": sum(sizes.values())}
+
+# =============================================================================
+# SOURCES
+# =============================================================================
+
+def file_signature(path):
+    """Cheap change marker for a ZIP or folder: sizes and modification times, no content reads."""
+    if os.path.isfile(path):
+        stat = os.stat(path)
+        return f"{stat.st_size}:{stat.st_mtime_ns}"
+    digest = hashlib.sha1()
+    for entry in sorted(os.scandir(path), key=lambda e: e.name):
+        if entry.is_file():
+            stat = entry.stat()
+            digest.update(f"{entry.name}:{stat.st_size}:{stat.st_mtime_ns};".encode())
+    return digest.hexdigest()
+
+def read_pngs(path, prefix=""):
+    """{name: bytes} for every PNG in a folder or ZIP (optionally under a ZIP member prefix)."""
+    files = {}
+    if os.path.isfile(path):
+        with zipfile.ZipFile(path) as zf:
+            for member in zf.namelist():
+                filename = member[len(prefix):] if member.startswith(prefix) else None
+                if filename and filename.endswith('.png') and '/' not in filename:
+                    files[filename] = zf.read(member)
+    else:
+        for filename in sorted(os.listdir(path)):
+            if filename.endswith('.png'):
+                with open(os.path.join(path, filename), 'rb') as f:
+                    files[filename] = f.read()
+    return files
+
+def ingest_gallery(store, images_root, versions=None, force=False, workers=HASH_WORKERS):
+    """Ingest every version of a gallery images folder in chain order. Unchanged sources are skipped."""
+    gallery = GallerySource(images_root)
+    chain = gallery.versions[gallery.versions.index(gallery.base):]
+    if versions:
+        chain = gallery.chain(max(versions, key=gallery.versions.index))
+    known = {}
+    version_files = {}  # version -> its manifest's files, each manifest read at most once
+    for version in chain:
+        if versions and version not in versions and store.load_manifest(version) is not None:
+            continue  # Earlier link of the chain, already in the store
+        zip_path = os.path.join(images_root, f"{version}.zip")
+        path = zip_path if os.path.exists(zip_path) else os.path.join(images_root, version)
+        signature = file_signature(path)
+        existing = store.load_manifest(version)
+        if existing and existing["source"].get("signature") == signature and not force:
+            print(f"Skipping {version}: unchanged since last ingest")
+            continue
+
+        supplied = gallery.resolve(version)
+
+        def effective(hashes, version=version, supplied=supplied):
+            # Every name resolves to the blob shipped by the version that last supplied it
+            for from_version in set(supplied.values()) - {version} - set(version_files):
+                version_files[from_version] = store.load_manifest(from_version)["files"]
+            images = {}
+            for filename, from_version in sorted(supplied.items()):
+                if from_version == version:
+                    images[filename] = hashes.get(filename)
+                else:
+                    images[filename] = version_files[from_version].get(filename)
+            return {filename: digest for filename, digest in images.items() if digest}
+
+        documents = {filename: gallery.read_json(version, filename)
+                     for filename in ("manifest.json", "changes.json")}
+        documents = {filename: document for filename, document in documents.items() if document is not None}
+        manifest = store.ingest(version, version, "gallery",
+                                {name: data for name, data in read_pngs(path, f"{version}/").items()
+                                 if name not in EXCLUDED_IMAGES},
+                                images=effective,
+                                documents=documents,
+                                source={"path": os.path.abspath(path), "signature": signature},
+                                known=known, workers=workers)
+        version_files[version] = manifest["files"]
+
+def ingest_archive(store, path, name=None, version=None, force=False, workers=HASH_WORKERS):
+    """Ingest a flat folder or release ZIP of PNGs."""
+    name = name or os.path.splitext(os.path.basename(os.path.normpath(path)))[0]
+    version = version or name.replace("minecraft-items-", "")
+    signature = file_signature(path)
+    existing = store.load_manifest(name)
+    if existing and existing["source"].get("signature") == signature and not force:
+        print(f"Skipping {name}: unchanged since last ingest")
+        return existing
+    return store.ingest(name, version, "flat", read_pngs(path),
+                        source={"path": os.path.abspath(path), "signature": signature}, workers=workers)
+
+# =============================================================================
+# MAIN SCRIPT
+# =============================================================================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Deduplicated, pixel-hash-addressed store of item images.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    ingest = commands.add_parser("ingest", help="Add a gallery images folder, release ZIP or image folder")
+    ingest.add_argument("store")
+    ingest.add_argument("sources", nargs="+")
+    ingest.add_argument("--versions", nargs="+", help="Only these gallery versions (plus their chain)")
+    ingest.add_argument("--force", action="store_true", help="Re-ingest sources that look unchanged")
+    ingest.add_argument("--workers", type=int, default=HASH_WORKERS)
+
+    rebuild = commands.add_parser("rebuild", help="Recreate an ingested version's ZIP or folder")
+    rebuild.add_argument("store")
+    rebuild.add_argument("name", help="Manifest name, e.g. 1.14.4 or minecraft-items-1.14.4")
+    rebuild.add_argument("--zip")
+    rebuild.add_argument("--folder")
+
+    diff = commands.add_parser("diff", help="changes.json between two ingested versions, from hashes only")
+    diff.add_argument("store")
+    diff.add_argument("old")
+    diff.add_argument("new")
+    diff.add_argument("--changes", help="Write the changes document here")
+
+    stats = commands.add_parser("stats", help="Storage saved by deduplication")
+    stats.add_argument("store")
+    args = parser.parse_args(argv)
+
+    store = ImageStore(args.store)
+    if args.command == "ingest":
+        for source in args.sources:
+            if os.path.isdir(source) and os.path.exists(os.path.join(source, VERSIONS_FILENAME)):
+                ingest_gallery(store, source, args.versions, args.force, args.workers)
+            else:
+                ingest_archive(store, source, force=args.force, workers=args.workers)
+    elif args.command == "rebuild":
+        if not args.zip and not args.folder:
+            parser.error("rebuild needs --zip and/or --folder")
+        if args.zip:
+            store.rebuild_zip(args.name, args.zip)
+        if args.folder:
+            store.rebuild_folder(args.name, args.folder)
+    elif args.command == "diff":
+        changes = store.diff(args.old, args.new)
+        if args.changes:
+            with open(args.changes, 'w') as f:
+                json.dump(changes, f, indent=2)
+            print(f"Changes file created: {args.changes}")
+        print(f"  +{len(changes['added'])} ~{len(changes['modified'])} -{len(changes['removed'])}")
+    elif args.command == "stats":
+        summary = store.stats()
+        saved = summary["referencedBytes"] - summary["storedBytes"]
+        print(f"{summary['manifests']} manifests, {summary['blobs']} blobs")
+        print(f"Referenced: {summary['referencedBytes'] / 1024 / 1024:.1f} MB, "
+              f"stored: {summary['storedBytes'] / 1024 / 1024:.1f} MB, saved: {saved / 1024 / 1024:.1f} MB")
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,173 @@
+"""
+Palette Engine
+
+Computes the dominant-colour palettes in public/metadata/palettes.json for a
+whole version at once, with the same rules as scripts/enrich-metadata.mjs:
+
+- pixels with alpha below 128 are ignored
+- each channel is rounded to the nearest multiple of 8
+- the MAX_COLORS most frequent colours are kept, ties in first-seen order
+
+Images are decoded, stacked by size into (batch, pixels, 4) arrays and
+quantized in one vectorized pass per batch: every opaque pixel becomes an
+(image, colour) key, and np.unique counts all keys of the batch together.
+
+Palettes are cached by pixel hash (see content_index.py), so items that did
+not change between versions are never decoded or quantized again when their
+hashes are already known (pixel_hashes.json or an image_store manifest).
+
+One deliberate difference: channels of 252-255 round up to 256, which the
+JavaScript version writes as the invalid hex "100"; this engine writes "ff".
+
+Usage:
+    python palette_engine.py ../public/images
+    python palette_engine.py ../public/images 1.21.5 --output palettes.json --cache palette_cache.json
+    python palette_engine.py ../public/images --hashes pixel_hashes.json
+"""
+
+import os
+import sys
+import json
+import argparse
+import numpy as np
+
+from content_index import pixel_hash, load_index
+from image_sources import GallerySource, image_name, iter_source, open_image
+
+MAX_COLORS = 10       # Colours kept per image
+ALPHA_THRESHOLD = 128 # Pixels below this alpha are ignored
+QUANT_STEP = 8        # Channels are rounded to multiples of this
+BATCH_SIZE = 256      # Images quantized together; bounds the memory of one batch
+PALETTE_CACHE_FILE = "palette_cache.json"
+PALETTES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "public", "metadata", "palettes.json")
+
+LEVELS = 256 // QUANT_STEP + 1  # Quantized values per channel (0..256 in steps of QUANT_STEP)
+
+# =============================================================================
+# QUANTIZATION
+# =============================================================================
+
+def quantize_batch(pixels, max_colors=MAX_COLORS):
+    """Palettes for a (batch, pixels, 4) uint8 RGBA array, as lists of hex strings."""
+    batch = pixels.shape[0]
+    opaque = pixels[..., 3] >= ALPHA_THRESHOLD
+    # Math.round(v / 8) * 8 - round half up
+    levels = (pixels[..., :3].astype(np.int64) + QUANT_STEP // 2) // QUANT_STEP
+    colors = (levels[..., 0] * LEVELS + levels[..., 1]) * LEVELS + levels[..., 2]
+    image_ids = np.broadcast_to(np.arange(batch)[:, None], opaque.shape)
+    keys = image_ids[opaque] * LEVELS ** 3 + colors[opaque]
+
+    # Count every (image, colour) pair of the batch at once; return_index is the
+    # first occurrence in raster order, which breaks ties like a stable sort
+    unique_keys, first_seen, counts = np.unique(keys, return_index=True, return_counts=True)
+    key_images = unique_keys // LEVELS ** 3
+    order = np.lexsort((first_seen, -counts, key_images))
+    unique_keys, key_images = unique_keys[order], key_images[order]
+
+    # Rank of each colour within its image
+    starts = np.searchsorted(key_images, np.arange(batch))
+    ranks = np.arange(len(unique_keys)) - starts[key_images]
+    keep = ranks < max_colors
+
+    palettes = [[] for _ in range(batch)]
+    for image_index, key in zip(key_images[keep].tolist(), unique_keys[keep].tolist()):
+        palettes[image_index].append(color_hex(key % LEVELS ** 3))
+    return palettes
+
+def color_hex(color):
+    """Hex string of a quantized colour index."""
+    r, rest = divmod(color, LEVELS * LEVELS)
+    g, b = divmod(rest, LEVELS)
+    return '#' + ''.join(f"{min(255, level * QUANT_STEP):02x}" for level in (r, g, b))
+
+# =============================================================================
+# BATCHES
+# =============================================================================
+
+def compute_palettes(images, hashes=None, cache=None, batch_size=BATCH_SIZE):
+    """Palettes for an iterable of image paths / image_sources entries.
+
+    hashes: optional {name: pixel hash}; items whose hash is in the cache are
+            not decoded at all.
+    cache:  {pixel hash: palette}, updated in place.
+    Returns ({name: palette}, number of images quantized).
+    """
+    hashes = hashes or {}
+    cache = {} if cache is None else cache
+    palettes = {}
+    pending = {}  # (height, width) -> [(name, pixel hash, pixels)]
+    quantized = 0
+
+    def flush(shape):
+        nonlocal quantized
+        group = pending.pop(shape)
+        stack = np.stack([pixels for _, _, pixels in group]).reshape(len(group), -1, 4)
+        for (name, digest, _), palette in zip(group, quantize_batch(stack)):
+            cache[digest] = palette
+            palettes[name] = palette
+        quantized += len(group)
+
+    for image in images:
+        name = image_name(image)
+        digest = hashes.get(name)
+        if digest in cache:
+            palettes[name] = cache[digest]
+            continue
+        with open_image(image) as im:
+            rgba = im.convert('RGBA')
+        digest = pixel_hash(rgba)
+        if digest in cache:
+            palettes[name] = cache[digest]
+            continue
+        pixels = np.asarray(rgba)
+        pending.setdefault(pixels.shape[:2], []).append((name, digest, pixels))
+        if len(pending[pixels.shape[:2]]) >= batch_size:
+            flush(pixels.shape[:2])
+    for shape in list(pending):
+        flush(shape)
+    return palettes, quantized
+
+def load_cache(cache_file):
+    if not cache_file or not os.path.exists(cache_file):
+        return {}
+    with open(cache_file, 'r') as f:
+        return json.load(f)
+
+def save_cache(cache, cache_file):
+    temp_file = f"{cache_file}.tmp"
+    with open(temp_file, 'w') as f:
+        json.dump(cache, f)
+    os.replace(temp_file, cache_file)
+
+# =============================================================================
+# MAIN SCRIPT
+# =============================================================================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compute palettes.json for a gallery version, release ZIP or folder.")
+    parser.add_argument("source", help="Gallery images folder (public/images), release ZIP or image folder")
+    parser.add_argument("version", nargs="?", help="Version to resolve in a gallery images folder (defaults to the newest)")
+    parser.add_argument("--output", default=PALETTES_FILE, help="palettes.json to write")
+    parser.add_argument("--cache", default=PALETTE_CACHE_FILE, help="Palette cache keyed by pixel hash")
+    parser.add_argument("--hashes", help="pixel_hashes.json or image_store manifest with the images' pixel hashes")
+    args = parser.parse_args(argv)
+
+    hashes = load_index(args.hashes)
+    if "images" in hashes and isinstance(hashes["images"], dict):
+        hashes = hashes["images"]  # image_store manifest
+    version = args.version
+    if version is None and os.path.exists(os.path.join(args.source, "versions.json")):
+        version = GallerySource(args.source).versions[-1]
+
+    cache = load_cache(args.cache)
+    palettes, quantized = compute_palettes(iter_source(args.source, version), hashes, cache)
+    palettes = {name: colors for name, colors in sorted(palettes.items()) if colors}
+    save_cache(cache, args.cache)
+
+    with open(args.output, 'w') as f:
+        json.dump(palettes, f, indent=2)
+        f.write('\n')
+    print(f"Wrote palettes for {len(palettes)} images to {args.output} ({quantized} quantized, the rest from cache)")
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
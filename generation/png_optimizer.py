@@ -0,0 +1,400 @@
+"""
+PNG Optimizer
+
+Losslessly re-encodes item PNGs into the smallest encoding it can find.
+Pillow's default save writes every image as 8-bit RGBA with one fixed filter
+strategy, while most items are small sprites with a handful of colours. For
+each image this tries:
+
+- colour types: palette + tRNS (1/2/4/8-bit indices), greyscale (with
+  bit-depth reduction or a tRNS key), RGB with a tRNS key, RGB, RGBA
+- PNG row filters: each fixed filter and per-row adaptive selection
+- zlib strategies at ZLIB_LEVEL
+
+Every colour type gets a quick probe encode first, and only those close to
+the best probe get the full filter x strategy search. The smallest result is
+kept, or the original bytes if nothing beats them.
+
+The colour of fully transparent pixels is normalised to zero first, the same
+normalisation content_index.pixel_hash applies, and every result is decoded
+again and checked against the original pixel hash before it is used.
+
+Files are optimized in a process pool. A state file records the size and
+mtime of every file already optimized, so reruns only look at new or
+rewritten files.
+
+Usage:
+    python png_optimizer.py transparent_images
+    python png_optimizer.py ../public/images/1.21.10 --dry-run
+    python png_optimizer.py ../public/images/1.21.10.zip
+"""
+
+import io
+import os
+import sys
+import json
+import zlib
+import struct
+import zipfile
+import argparse
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from PIL import Image
+
+from content_index import pixel_hash
+
+ZLIB_LEVEL = 9
+# Searched for each image; on the gallery's sprites Z_RLE and the fixed Sub,
+# Average and Paeth filters never produced the smallest file
+ZLIB_STRATEGIES = (zlib.Z_DEFAULT_STRATEGY, zlib.Z_FILTERED)
+ROW_FILTERS = (0, 2, "adaptive")  # PNG filter types (0 None ... 4 Paeth); "adaptive" picks per row
+PROBE_MARGIN = 0.1   # Colour types whose quick probe is within this of the best get the full search
+OPTIMIZE_WORKERS = os.cpu_count() or 1
+OPTIMIZE_STATE_FILE = "png_optimizer_state.json"
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+# PNG colour types
+GREY, RGB, PALETTE, GREY_ALPHA, RGBA = 0, 2, 3, 4, 6
+
+# =============================================================================
+# ENCODING
+# =============================================================================
+
+def png_chunk(kind, data):
+    return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+def filter_rows(rows, bpp, filter_type, previous=None):
+    """Apply a PNG filter to (height, stride) uint8 rows, returning the filtered scanlines with filter bytes.
+
+    previous is the row above rows[0] when rows are one band of a larger image.
+    """
+    if previous is not None:
+        return filter_rows(np.vstack([previous[None], rows]), bpp, filter_type)[rows.shape[1] + 1:]
+    raw = rows.astype(np.int16)
+    left = np.zeros_like(raw)
+    left[:, bpp:] = raw[:, :-bpp]
+    up = np.zeros_like(raw)
+    up[1:] = raw[:-1]
+    upper_left = np.zeros_like(raw)
+    upper_left[1:, bpp:] = raw[:-1, :-bpp]
+
+    def paeth():
+        estimate = left + up - upper_left
+        distance_left, distance_up = np.abs(estimate - left), np.abs(estimate - up)
+        distance_upper_left = np.abs(estimate - upper_left)
+        predictor = np.where((distance_left <= distance_up) & (distance_left <= distance_upper_left), left,
+                             np.where(distance_up <= distance_upper_left, up, upper_left))
+        return raw - predictor
+
+    filters = {
+        0: lambda: raw,
+        1: lambda: raw - left,
+        2: lambda: raw - up,
+        3: lambda: raw - (left + up) // 2,
+        4: paeth,
+    }
+    if filter_type == "adaptive":
+        # Standard heuristic: per row, the filter with the smallest sum of absolute signed bytes
+        candidates = np.stack([(filters[f]() & 0xFF).astype(np.uint8) for f in range(5)])
+        costs = np.abs(candidates.view(np.int8).astype(np.int32)).sum(axis=2)
+        chosen = costs.argmin(axis=0)
+        filtered = candidates[chosen, np.arange(rows.shape[0])]
+        filter_bytes = chosen.astype(np.uint8)
+    else:
+        filtered = (filters[filter_type]() & 0xFF).astype(np.uint8)
+        filter_bytes = np.full(rows.shape[0], filter_type, dtype=np.uint8)
+    return np.concatenate([filter_bytes[:, None], filtered], axis=1).tobytes()
+
+def encode_png(width, height, color_type, bit_depth, rows, bpp, extra_chunks=(),
+               filters=ROW_FILTERS, strategies=ZLIB_STRATEGIES):
+    """Smallest PNG of already packed rows over filters x strategies."""
+    best = None
+    for filter_type in filters:
+        scanlines = filter_rows(rows, bpp, filter_type)
+        for strategy in strategies:
+            compressor = zlib.compressobj(ZLIB_LEVEL, zlib.DEFLATED, zlib.MAX_WBITS, 9, strategy)
+            data = compressor.compress(scanlines) + compressor.flush()
+            if best is None or len(data) < len(best):
+                best = data
+    header = struct.pack(">IIBBBBB", width, height, bit_depth, color_type, 0, 0, 0)
+    return b"".join([PNG_SIGNATURE, png_chunk(b"IHDR", header), *extra_chunks,
+                     png_chunk(b"IDAT", best), png_chunk(b"IEND", b"")])
+
+class PNGStreamWriter:
+    """Writes an 8-bit RGBA PNG band by band, so the whole image never has to be in memory.
+
+    Rows are filtered and fed to one zlib stream as they arrive, and the
+    compressed output is flushed to the file in IDAT chunks of IDAT_CHUNK_SIZE.
+    """
+
+    IDAT_CHUNK_SIZE = 1 << 16
+    FILTER_ROWS = 32  # Rows filtered at a time; adaptive filtering holds several int16 copies of them
+
+    def __init__(self, file, width, height, filter_type="adaptive"):
+        self.file = file
+        self.width = width
+        self.height = height
+        self.filter_type = filter_type
+        self.rows_written = 0
+        self.previous = None
+        self.pending = b""
+        self.compressor = zlib.compressobj(ZLIB_LEVEL)
+        header = struct.pack(">IIBBBBB", width, height, 8, RGBA, 0, 0, 0)
+        file.write(PNG_SIGNATURE + png_chunk(b"IHDR", header))
+
+    def write_rows(self, pixels):
+        """Append a (rows, width, 4) uint8 band below the rows written so far."""
+        if pixels.shape[1:] != (self.width, 4) or self.rows_written + pixels.shape[0] > self.height:
+            raise ValueError(f"{pixels.shape} band does not fit a {self.width}x{self.height} RGBA image "
+                             f"with {self.rows_written} rows written")
+        rows = pixels.reshape(pixels.shape[0], -1)
+        for start in range(0, rows.shape[0], self.FILTER_ROWS):
+            batch = rows[start:start + self.FILTER_ROWS]
+            self.pending += self.compressor.compress(filter_rows(batch, 4, self.filter_type, self.previous))
+            self.previous = batch[-1].copy()
+            while len(self.pending) >= self.IDAT_CHUNK_SIZE:
+                self.file.write(png_chunk(b"IDAT", self.pending[:self.IDAT_CHUNK_SIZE]))
+                self.pending = self.pending[self.IDAT_CHUNK_SIZE:]
+        self.rows_written += pixels.shape[0]
+
+    def close(self):
+        """Finish the zlib stream and write the last IDAT and IEND chunks."""
+        if self.rows_written != self.height:
+            raise ValueError(f"Only {self.rows_written} of {self.height} rows were written")
+        self.pending += self.compressor.flush()
+        self.file.write(png_chunk(b"IDAT", self.pending) + png_chunk(b"IEND", b""))
+        self.pending = b""
+
+def pack_bits(values, bit_depth):
+    """Pack (height, width) sample values below 2**bit_depth into PNG rows."""
+    if bit_depth == 8:
+        return values.astype(np.uint8)
+    per_byte = 8 // bit_depth
+    height, width = values.shape
+    padded = np.zeros((height, -(-width // per_byte) * per_byte), dtype=np.uint8)
+    padded[:, :width] = values
+    shifts = (8 - bit_depth) - bit_depth * np.arange(per_byte, dtype=np.uint8)
+    grouped = padded.reshape(height, -1, per_byte) << shifts
+    return np.bitwise_or.reduce(grouped, axis=2).astype(np.uint8)
+
+def smallest_bit_depth(max_value):
+    return next(depth for depth in (1, 2, 4, 8) if max_value < 1 << depth)
+
+# =============================================================================
+# CANDIDATE ENCODINGS
+# =============================================================================
+
+def candidate_encodings(pixels):
+    """Yield encode_png() arguments for every colour type that can represent (height, width, 4) RGBA pixels exactly."""
+    height, width = pixels.shape[:2]
+    alpha = pixels[..., 3]
+    opaque = bool((alpha == 255).all())
+    binary_alpha = bool(((alpha == 0) | (alpha == 255)).all())
+    rgb = pixels[..., :3]
+    grey = bool(((rgb[..., 0] == rgb[..., 1]) & (rgb[..., 1] == rgb[..., 2])).all())
+
+    # Palette: only when at most 256 distinct RGBA colours
+    packed = pixels.view(np.uint32).reshape(height, width)
+    colors, inverse, counts = np.unique(packed, return_inverse=True, return_counts=True)
+    if len(colors) <= 256:
+        palette = colors.view(np.uint8).reshape(-1, 4)
+        # Translucent entries first so tRNS stays short, then most used first
+        order = np.lexsort((-counts, palette[:, 3] == 255))
+        palette = palette[order]
+        remap = np.empty(len(order), dtype=np.uint8)
+        remap[order] = np.arange(len(order), dtype=np.uint8)
+        indices = remap[inverse.reshape(height, width)]
+        bit_depth = smallest_bit_depth(len(palette) - 1)
+        chunks = [png_chunk(b"PLTE", palette[:, :3].tobytes())]
+        translucent = int((palette[:, 3] < 255).sum())
+        if translucent:
+            chunks.append(png_chunk(b"tRNS", palette[:translucent, 3].tobytes()))
+        yield (width, height, PALETTE, bit_depth, pack_bits(indices, bit_depth), 1, chunks)
+
+    if grey and (opaque or binary_alpha):
+        values = rgb[..., 0]
+        chunks = []
+        if not opaque:
+            # Transparent pixels need a grey level no opaque pixel uses
+            unused = np.setdiff1d(np.arange(256), values[alpha == 255])
+            if len(unused):
+                values = values.copy()
+                values[alpha == 0] = unused[0]
+                chunks.append(png_chunk(b"tRNS", struct.pack(">H", int(unused[0]))))
+        if opaque or chunks:
+            bit_depth, samples = 8, values
+            for depth in (1, 2, 4):
+                scale = 255 // ((1 << depth) - 1)
+                if not (values % scale).any():
+                    bit_depth, samples = depth, values // scale
+                    if chunks:
+                        chunks = [png_chunk(b"tRNS", struct.pack(">H", int(unused[0]) // scale))]
+                    break
+            yield (width, height, GREY, bit_depth, pack_bits(samples, bit_depth), 1, chunks)
+    if grey and not opaque:
+        yield (width, height, GREY_ALPHA, 8, pixels[..., [0, 3]].reshape(height, -1), 2)
+
+    if opaque:
+        yield (width, height, RGB, 8, rgb.reshape(height, -1), 3)
+    else:
+        if binary_alpha:
+            # RGB with one transparent key colour, if some colour is unused by opaque pixels
+            used = set(packed[alpha == 255].tolist())
+            key = next((value for value in (0, 0xFF000000, 0x00FF00FF) if (value | 0xFF000000) not in used), None)
+            if key is not None:
+                key_rgb = np.frombuffer(struct.pack("<I", key), dtype=np.uint8)[:3]
+                keyed = rgb.copy()
+                keyed[alpha == 0] = key_rgb
+                chunks = [png_chunk(b"tRNS", struct.pack(">HHH", *key_rgb.tolist()))]
+                yield (width, height, RGB, 8, keyed.reshape(height, -1), 3, chunks)
+        yield (width, height, RGBA, 8, pixels.reshape(height, -1), 4)
+
+def optimize_png(data):
+    """Smallest lossless encoding of PNG bytes, or the original bytes if nothing is smaller."""
+    with Image.open(io.BytesIO(data)) as im:
+        rgba = im.convert('RGBA')
+    expected = pixel_hash(rgba)
+    pixels = np.array(rgba)
+    pixels[pixels[..., 3] == 0] = 0
+
+    # A quick probe of every colour type, then the full filter/strategy search
+    # only for the ones within PROBE_MARGIN of the best probe
+    probes = []
+    for candidate in candidate_encodings(pixels):
+        probe = encode_png(*candidate, filters=(0, "adaptive"), strategies=(zlib.Z_DEFAULT_STRATEGY,))
+        probes.append((len(probe), probe, candidate))
+    shortlist_limit = min(size for size, _, _ in probes) * (1 + PROBE_MARGIN)
+
+    best = data
+    for size, probe, candidate in sorted(probes, key=lambda p: p[0]):
+        if size > shortlist_limit:
+            break
+        for encoded in (probe, encode_png(*candidate)):
+            if len(encoded) < len(best):
+                with Image.open(io.BytesIO(encoded)) as im:
+                    if pixel_hash(im.convert('RGBA')) == expected:
+                        best = encoded
+    return best
+
+# =============================================================================
+# FILES
+# =============================================================================
+
+def optimize_file(task):
+    """Optimize one PNG in place (runs in a worker process). Returns (path, bytes before, bytes after)."""
+    path, dry_run = task
+    with open(path, 'rb') as f:
+        data = f.read()
+    optimized = optimize_png(data)
+    if len(optimized) < len(data) and not dry_run:
+        temp_path = f"{path}.tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(optimized)
+        os.replace(temp_path, path)
+    return path, len(data), len(optimized)
+
+def optimize_bytes(data):
+    """optimize_png() for a process pool, returning (before, after bytes)."""
+    return len(data), optimize_png(data)
+
+def load_state(state_file):
+    if not state_file or not os.path.exists(state_file):
+        return {}
+    with open(state_file, 'r') as f:
+        return json.load(f)
+
+def save_state(state, state_file):
+    temp_file = f"{state_file}.tmp"
+    with open(temp_file, 'w') as f:
+        json.dump(state, f, indent=2)
+    os.replace(temp_file, state_file)
+
+def optimize_directory(directory, state_file=None, workers=OPTIMIZE_WORKERS, dry_run=False):
+    """Optimize every PNG in a folder that changed since the last run. Returns (bytes before, bytes after)."""
+    state = load_state(state_file)
+    tasks = []
+    for entry in sorted(os.scandir(directory), key=lambda e: e.name):
+        if not entry.name.endswith('.png'):
+            continue
+        stat = entry.stat()
+        if state.get(entry.name) == [stat.st_size, stat.st_mtime_ns]:
+            continue
+        tasks.append((entry.path, dry_run))
+
+    before = after = 0
+    if tasks:
+        workers = max(1, min(workers, len(tasks)))
+        if workers == 1:
+            results = map(optimize_file, tasks)
+        else:
+            executor = ProcessPoolExecutor(max_workers=workers)
+            results = executor.map(optimize_file, tasks, chunksize=max(1, len(tasks) // (workers * 4)))
+        for path, size_before, size_after in results:
+            before += size_before
+            after += min(size_before, size_after)
+            if not dry_run:
+                stat = os.stat(path)
+                state[os.path.basename(path)] = [stat.st_size, stat.st_mtime_ns]
+        if workers > 1:
+            executor.shutdown()
+
+    for filename in list(state):
+        if not os.path.exists(os.path.join(directory, filename)):
+            del state[filename]
+    if state_file and not dry_run:
+        save_state(state, state_file)
+    report_savings(len(tasks), before, after, dry_run)
+    return before, after
+
+def optimize_zip(zip_path, workers=OPTIMIZE_WORKERS, dry_run=False):
+    """Rewrite a ZIP with every PNG member optimized; other members are copied unchanged."""
+    with zipfile.ZipFile(zip_path) as source:
+        infos = source.infolist()
+        contents = [source.read(info) for info in infos]
+    pngs = [i for i, info in enumerate(infos) if info.filename.endswith('.png')]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(optimize_bytes, (contents[i] for i in pngs), chunksize=16))
+    before = sum(size for size, _ in results)
+    after = sum(len(data) for _, data in results)
+    for i, (_, data) in zip(pngs, results):
+        contents[i] = data
+
+    if not dry_run:
+        temp_path = f"{zip_path}.tmp"
+        with zipfile.ZipFile(temp_path, 'w', zipfile.ZIP_DEFLATED) as target:
+            for info, data in zip(infos, contents):
+                # PNG data is already deflated; storing it avoids a pointless second pass
+                compress = zipfile.ZIP_STORED if info.filename.endswith('.png') else zipfile.ZIP_DEFLATED
+                target.writestr(info, data, compress_type=compress)
+        os.replace(temp_path, zip_path)
+    report_savings(len(pngs), before, after, dry_run)
+    return before, after
+
+def report_savings(files, before, after, dry_run=False):
+    saved = before - after
+    percent = saved / before * 100 if before else 0
+    action = "Would save" if dry_run else "Saved"
+    print(f"PNG optimizer: {files} files checked, {before / 1024:.1f} KB -> {after / 1024:.1f} KB. "
+          f"{action} {saved / 1024:.1f} KB ({percent:.1f}%)")
+
+# =============================================================================
+# MAIN SCRIPT
+# =============================================================================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Losslessly shrink the PNGs in a folder or ZIP.")
+    parser.add_argument("paths", nargs="+", help="Folders of PNGs or ZIPs containing PNGs")
+    parser.add_argument("--state", help="State file for skipping unchanged files (folders only)")
+    parser.add_argument("--workers", type=int, default=OPTIMIZE_WORKERS)
+    parser.add_argument("--dry-run", action="store_true", help="Only report the savings")
+    args = parser.parse_args(argv)
+
+    for path in args.paths:
+        if path.endswith('.zip'):
+            optimize_zip(path, args.workers, args.dry_run)
+        else:
+            optimize_directory(path, args.state, args.workers, args.dry_run)
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
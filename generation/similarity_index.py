@@ -0,0 +1,227 @@
+"""
+Similarity Index
+
+changes.json marks an item "modified" for any difference at all, so a
+re-capture that moved one pixel looks the same as a redesigned texture. This
+index walks a gallery's whole version history and records, for every item:
+
+- a 64-bit perceptual hash (DCT of a 32x32 luminance thumbnail) per version
+- for every item shipped again in a version, the change against its previous
+  image: fraction of changed pixels, mean per-channel delta and the perceptual
+  hash distance, classified as
+
+      identical    same pixels (only the PNG bytes changed)
+      noise        at most NOISE_MAX_CHANGED_PIXELS changed, or a faint change
+                   (mean delta <= NOISE_MAX_MEAN_DELTA) that keeps the
+                   perceptual hash within NOISE_MAX_HAMMING bits
+      change       anything else
+
+Each image is decoded once; hashing and deltas run on stacked arrays for the
+whole version. The index also answers "items most similar to X" by Hamming
+distance over all perceptual hashes of a version.
+
+Index format (similarity_index.json):
+    {
+      "versions": ["1.13.2", ...],
+      "phash": {"1.21.5": {"stone.png": "<16 hex digits>"}},
+      "changes": {"1.21.5": {"stone.png": {"class": "noise", "changedPixels": 0.0001,
+                                          "meanDelta": 0.02, "hamming": 0}}}
+    }
+
+Usage:
+    python similarity_index.py build ../public/images similarity_index.json
+    python similarity_index.py report similarity_index.json 1.21.5
+    python similarity_index.py similar similarity_index.json creeper_spawn_egg.png --version 1.21.5 -k 10
+"""
+
+import sys
+import json
+import argparse
+import numpy as np
+from PIL import Image
+
+from image_sources import GallerySource, open_image
+
+HASH_SIZE = 8                     # Perceptual hash is HASH_SIZE x HASH_SIZE bits
+THUMBNAIL_SIZE = 32               # Luminance thumbnail the DCT runs on
+NOISE_MAX_CHANGED_PIXELS = 0.002  # Fraction of pixels that may differ and still be noise
+NOISE_MAX_MEAN_DELTA = 0.5        # Mean per-channel difference (0-255) of a faint change
+NOISE_MAX_HAMMING = 2             # Perceptual hash bits a faint change may flip
+INDEX_FILENAME = "similarity_index.json"
+
+# =============================================================================
+# HASHING AND DELTAS
+# =============================================================================
+
+def dct_matrix(size):
+    """Orthonormal DCT-II matrix."""
+    k = np.arange(size)[:, None]
+    n = np.arange(size)[None, :]
+    matrix = np.cos(np.pi * (2 * n + 1) * k / (2 * size)) * np.sqrt(2 / size)
+    matrix[0] /= np.sqrt(2)
+    return matrix
+
+DCT = dct_matrix(THUMBNAIL_SIZE)
+
+def normalized_pixels(image):
+    """RGBA uint8 array with fully transparent pixels zeroed (as content_index.pixel_hash does)."""
+    pixels = np.array(image.convert('RGBA'))
+    pixels[pixels[..., 3] == 0] = 0
+    return pixels
+
+def thumbnail(pixels):
+    """THUMBNAIL_SIZE square luminance of an RGBA array composited on black."""
+    rgba = Image.fromarray(pixels).resize((THUMBNAIL_SIZE, THUMBNAIL_SIZE), Image.Resampling.BOX)
+    values = np.asarray(rgba, dtype=np.float32) / 255
+    luminance = values[..., :3] @ np.array([0.299, 0.587, 0.114], dtype=np.float32)
+    return luminance * values[..., 3]
+
+def perceptual_hashes(thumbnails):
+    """64-bit pHash of a (batch, 32, 32) stack: low-frequency DCT coefficients above their median."""
+    coefficients = np.einsum('ij,bjk,lk->bil', DCT, thumbnails, DCT)[:, :HASH_SIZE, :HASH_SIZE]
+    coefficients = coefficients.reshape(len(thumbnails), -1)
+    medians = np.median(coefficients[:, 1:], axis=1, keepdims=True)  # Skip the DC term
+    bits = coefficients > medians
+    return np.packbits(bits, axis=1).view('>u8').ravel()
+
+def hamming_distances(hash_value, hashes):
+    """Bits differing between one hash and an array of uint64 hashes."""
+    return np.unpackbits((hashes ^ np.uint64(hash_value)).astype('>u8').view(np.uint8).reshape(-1, 8),
+                         axis=1).sum(axis=1)
+
+def pixel_deltas(old, new):
+    """(changed pixel fraction, mean per-channel delta) for stacks of same-size RGBA arrays."""
+    difference = np.abs(old.astype(np.int16) - new.astype(np.int16))
+    changed = difference.max(axis=3) > 0
+    return changed.mean(axis=(1, 2)), difference.mean(axis=(1, 2, 3))
+
+def classify(changed_pixels, mean_delta, hamming):
+    if changed_pixels == 0:
+        return "identical"
+    if changed_pixels <= NOISE_MAX_CHANGED_PIXELS:
+        return "noise"
+    if mean_delta <= NOISE_MAX_MEAN_DELTA and hamming <= NOISE_MAX_HAMMING:
+        return "noise"
+    return "change"
+
+# =============================================================================
+# BUILD
+# =============================================================================
+
+def build_similarity_index(images_root):
+    """Walk every version of a gallery images folder and build the similarity index."""
+    gallery = GallerySource(images_root)
+    chain = gallery.chain(gallery.versions[-1])
+    current = {}  # name -> (pixels, phash) of the newest image so far
+    index = {"versions": chain, "phash": {}, "changes": {}}
+
+    for version in chain:
+        resolved = gallery.resolve(version)
+        shipped = sorted(name for name, supplied in resolved.items() if supplied == version)
+        pixels = {}
+        for name in shipped:
+            with open_image(gallery.entry(name, version)) as im:
+                pixels[name] = normalized_pixels(im)
+        hashes = dict(zip(shipped, perceptual_hashes(np.stack([thumbnail(pixels[name]) for name in shipped])).tolist())) \
+            if shipped else {}
+
+        # Compare re-shipped items with their previous image, one stacked batch per image size
+        changes = {}
+        groups = {}
+        for name in shipped:
+            if name in current:
+                old_pixels = current[name][0]
+                if old_pixels.shape == pixels[name].shape:
+                    groups.setdefault(old_pixels.shape, []).append(name)
+                else:
+                    changes[name] = {"class": "change", "changedPixels": 1.0, "meanDelta": None,
+                                     "hamming": int(hamming_distances(current[name][1], np.array([hashes[name]],
+                                                                                                 dtype=np.uint64))[0])}
+        for names in groups.values():
+            changed, mean = pixel_deltas(np.stack([current[name][0] for name in names]),
+                                         np.stack([pixels[name] for name in names]))
+            old_hashes = np.array([current[name][1] for name in names], dtype=np.uint64)
+            new_hashes = np.array([hashes[name] for name in names], dtype=np.uint64)
+            hamming = np.unpackbits((old_hashes ^ new_hashes).astype('>u8').view(np.uint8).reshape(-1, 8),
+                                    axis=1).sum(axis=1)
+            for name, changed_pixels, mean_delta, bits in zip(names, changed.tolist(), mean.tolist(), hamming.tolist()):
+                changes[name] = {"class": classify(changed_pixels, mean_delta, bits),
+                                 "changedPixels": round(changed_pixels, 6), "meanDelta": round(mean_delta, 4),
+                                 "hamming": int(bits)}
+
+        for name in list(current):
+            if name not in resolved:
+                del current[name]
+        for name in shipped:
+            current[name] = (pixels[name], hashes[name])
+
+        index["phash"][version] = {name: f"{current[name][1]:016x}" for name in sorted(resolved) if name in current}
+        index["changes"][version] = dict(sorted(changes.items()))
+        counts = {label: sum(1 for c in changes.values() if c["class"] == label)
+                  for label in ("identical", "noise", "change")}
+        print(f"{version}: {len(shipped)} images decoded, {len(changes)} re-shipped "
+              f"({counts['identical']} identical, {counts['noise']} noise, {counts['change']} changed)")
+    return index
+
+# =============================================================================
+# QUERIES
+# =============================================================================
+
+def most_similar(index, name, version=None, k=10):
+    """The k items of a version whose perceptual hash is closest to name's, as (name, distance) pairs."""
+    version = version or index["versions"][-1]
+    hashes = index["phash"][version]
+    if name not in hashes:
+        raise KeyError(f"{name} is not in {version}")
+    names = list(hashes)
+    values = np.array([int(hashes[n], 16) for n in names], dtype=np.uint64)
+    distances = hamming_distances(int(hashes[name], 16), values)
+    order = np.argsort(distances, kind='stable')
+    return [(names[i], int(distances[i])) for i in order if names[i] != name][:k]
+
+def load_similarity_index(index_file):
+    with open(index_file, 'r') as f:
+        return json.load(f)
+
+# =============================================================================
+# MAIN SCRIPT
+# =============================================================================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Perceptual-hash and change-magnitude index of a gallery.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    build = commands.add_parser("build", help="Index every version of a gallery images folder")
+    build.add_argument("images_root", help="Gallery images folder (public/images)")
+    build.add_argument("index_file", nargs="?", default=INDEX_FILENAME)
+
+    report = commands.add_parser("report", help="Classified changes of one version")
+    report.add_argument("index_file")
+    report.add_argument("version")
+
+    similar = commands.add_parser("similar", help="Items most similar to one item")
+    similar.add_argument("index_file")
+    similar.add_argument("name", help="Item file name, e.g. stone.png")
+    similar.add_argument("--version", help="Version to search (defaults to the newest)")
+    similar.add_argument("-k", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        index = build_similarity_index(args.images_root)
+        with open(args.index_file, 'w') as f:
+            json.dump(index, f, indent=2)
+        print(f"Similarity index saved: {args.index_file}")
+    elif args.command == "report":
+        changes = load_similarity_index(args.index_file)["changes"][args.version]
+        for label in ("identical", "noise", "change"):
+            names = [name for name, change in changes.items() if change["class"] == label]
+            print(f"{label}: {len(names)}")
+            if label != "change":
+                for name in names:
+                    print(f"  {name}  changed {changes[name]['changedPixels']:.4%}, hamming {changes[name]['hamming']}")
+    elif args.command == "similar":
+        for name, distance in most_similar(load_similarity_index(args.index_file), args.name, args.version, args.k):
+            print(f"{distance:>3}  {name}")
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,101 @@
+"""
+Simulated Capture Run
+
+Runs the full MinecraftItemPipeline capture loop - navigation or ID modes,
+loop detection, MAX_CONSECUTIVE_EMPTY handling, verification, re-shoots, the
+background writer and post-processing - against capture_backends.SimulatedGame
+instead of a live Minecraft window. No display, GPU, keyboard hook or
+clipboard is needed, so capture-loop changes can be regression-tested and
+their throughput compared anywhere.
+
+Usage:
+    python simulate_capture.py
+    python simulate_capture.py --items ../public/images/1.13.2/manifest.json --mode batch --batch-size 36
+    python simulate_capture.py --output sim_run --keep
+"""
+
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+
+import MinecraftItemPipeline as pipeline
+from capture_backends import SimulatedGame
+
+DEFAULT_ITEMS = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             "..", "public", "images", "1.13.2", "manifest.json")
+
+def build_game(item_ids, render_delay=0.0, copy_delay=0.0):
+    """Create a SimulatedGame laid out like the pipeline's configured slot grid."""
+    return SimulatedGame(
+        item_ids,
+        pipeline.PLAYER_NAME,
+        hotbar_origin=pipeline.SCREENSHOT_REGION[:2],
+        inventory_origin=(pipeline.BATCH_REGION[0] + pipeline.INVENTORY_ORIGIN[0],
+                          pipeline.BATCH_REGION[1] + pipeline.INVENTORY_ORIGIN[1]),
+        slot_size=pipeline.SLOT_SIZE,
+        slot_pitch=pipeline.SLOT_PITCH,
+        render_delay=render_delay,
+        copy_delay=copy_delay
+    )
+
+def simulate(item_ids, output_dir, mode="navigation", batch_size=9, start_letter="a", render_delay=0.0,
+             copy_delay=0.0):
+    """Run one capture session against a simulated game. Returns (game, seconds, captured items)."""
+    pipeline.set_base_directory(output_dir)
+    pipeline.setup_directories()
+    if mode == "navigation":
+        pipeline.ITEM_ID_SOURCE = None
+    else:
+        ids_file = os.path.join(output_dir, "registry.txt")
+        with open(ids_file, 'w', encoding='utf-8') as f:
+            f.write("\n".join(item_ids) + "\n")
+        pipeline.ITEM_ID_SOURCE = ids_file
+    pipeline.BATCH_SIZE = batch_size if mode == "batch" else 1
+
+    game = build_game(item_ids, render_delay, copy_delay)
+    pipeline.use_backend(game)
+    journal = pipeline.ProgressJournal()
+    journal.load()
+
+    start = time.perf_counter()
+    pipeline.run_capture(journal, start_letter)
+    return game, time.perf_counter() - start, len(journal.processed_items)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the capture loop against a simulated game.")
+    parser.add_argument("--items", default=DEFAULT_ITEMS,
+                        help="Registry dump or gallery manifest.json listing the simulated item IDs")
+    parser.add_argument("--mode", choices=["navigation", "ids", "batch"], default="navigation",
+                        help="Tab-completion navigation, give-by-ID, or batch capture")
+    parser.add_argument("--batch-size", type=int, default=36, help="Items per screenshot in batch mode")
+    parser.add_argument("--start-letter", default="a")
+    parser.add_argument("--render-delay", type=float, default=0.05,
+                        help="Simulated seconds for the inventory to appear after pressing E")
+    parser.add_argument("--copy-delay", type=float, default=0.02,
+                        help="Simulated seconds for Ctrl+C to reach the clipboard")
+    parser.add_argument("--output", help="Output folder (defaults to a temporary folder)")
+    parser.add_argument("--keep", action="store_true", help="Keep the output folder")
+    args = parser.parse_args(argv)
+
+    item_ids = pipeline.load_item_ids(args.items)
+    output_dir = args.output or tempfile.mkdtemp(prefix="simulated-capture-")
+    try:
+        game, seconds, captured = simulate(item_ids, output_dir, args.mode, args.batch_size,
+                                           args.start_letter, args.render_delay, args.copy_delay)
+    finally:
+        if not args.keep and not args.output:
+            shutil.rmtree(output_dir, ignore_errors=True)
+
+    print("=" * 80)
+    print(f"SIMULATED CAPTURE ({args.mode})")
+    print(f"Items in registry: {len(item_ids)}")
+    print(f"Items captured: {captured}")
+    print(f"Keystrokes: {game.keystrokes} ({game.keystrokes / max(captured, 1):.1f} per item)")
+    print(f"Simulated game time: {game.clock():.1f} seconds")
+    print(f"Wall time: {seconds:.2f} seconds ({captured / seconds:.1f} items per second)")
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,280 @@
+"""
+Sprite Atlas Exporter
+
+Packs a version's transparent item images into a few sprite-sheet pages so
+clients can fetch a whole version in a handful of requests, and writes a JSON
+coordinate index keyed by item filename.
+
+Packing uses a guillotine rectangle packer: every page keeps a list of free
+rectangles, each sprite goes into the free rectangle it fits most tightly
+(best short side fit), and the remainder is split in two along the shorter
+leftover axis. Sprites are packed tallest first with PADDING pixels around
+them, and a new page is started when nothing fits.
+
+Because the free list is saved in the index, later runs are incremental:
+
+- modified items with an unchanged size are repainted in place
+- removed items free their rectangle
+- added items (and resized ones) go into free space, or a new page
+
+Only the pages that changed are re-rendered, in parallel. The changes come
+from a changes.json when one is given, otherwise from comparing the pixel
+hashes stored in the index.
+
+Index format (atlas.json):
+    {
+      "version": "1.21.5",
+      "padding": 2,
+      "pages": [{"file": "atlas-0.png", "width": 2048, "height": 2048}, ...],
+      "images": {"stone.png": {"page": 0, "x": 2, "y": 2, "w": 128, "h": 128, "hash": "<pixel hash>"}},
+      "free": [[page, x, y, w, h], ...]
+    }
+
+Usage:
+    python sprite_atlas.py ../public/images atlas_out --version 1.21.4
+    python sprite_atlas.py ../public/images atlas_out --version 1.21.5 --changes ../public/images/1.21.5/changes.json
+    python sprite_atlas.py transparent_images atlas_out --manifest manifest.json
+"""
+
+import os
+import sys
+import json
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from PIL import Image
+
+from content_index import pixel_hash
+from image_sources import GallerySource, image_name, iter_source, iter_manifest, open_image
+
+ATLAS_SIZE = 2048     # Page width and height
+PADDING = 2           # Transparent pixels around each sprite, so filtering does not bleed between sprites
+ATLAS_WORKERS = os.cpu_count() or 1
+INDEX_FILENAME = "atlas.json"
+PAGE_FILENAME = "atlas-{}.png"
+
+# =============================================================================
+# PACKING
+# =============================================================================
+
+class GuillotinePacker:
+    """Free-rectangle lists for a growing set of fixed-size pages."""
+
+    def __init__(self, page_size=ATLAS_SIZE, free=None, pages=0):
+        self.page_size = page_size
+        self.free = [list(rect) for rect in free or []]
+        self.pages = pages
+
+    def insert(self, width, height):
+        """Reserve a width x height rectangle. Returns (page, x, y)."""
+        if width > self.page_size or height > self.page_size:
+            raise ValueError(f"{width}x{height} sprite does not fit a {self.page_size}px atlas page")
+        best = None
+        for index, (page, x, y, free_width, free_height) in enumerate(self.free):
+            if free_width >= width and free_height >= height:
+                fit = (min(free_width - width, free_height - height), page, y, x)
+                if best is None or fit < best[0]:
+                    best = (fit, index)
+        if best is None:
+            self.free.append([self.pages, 0, 0, self.page_size, self.page_size])
+            self.pages += 1
+            best = (None, len(self.free) - 1)
+
+        page, x, y, free_width, free_height = self.free.pop(best[1])
+        leftover_width, leftover_height = free_width - width, free_height - height
+        if leftover_width < leftover_height:
+            right = [page, x + width, y, leftover_width, height]
+            below = [page, x, y + height, free_width, leftover_height]
+        else:
+            right = [page, x + width, y, leftover_width, free_height]
+            below = [page, x, y + height, width, leftover_height]
+        self.free.extend(rect for rect in (right, below) if rect[3] > 0 and rect[4] > 0)
+        return page, x, y
+
+    def release(self, page, x, y, width, height):
+        """Return a rectangle to the free list."""
+        self.free.append([page, x, y, width, height])
+
+# =============================================================================
+# INDEX
+# =============================================================================
+
+def load_atlas_index(out_dir):
+    path = os.path.join(out_dir, INDEX_FILENAME)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r') as f:
+        return json.load(f)
+
+def save_atlas_index(index, out_dir):
+    path = os.path.join(out_dir, INDEX_FILENAME)
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'w') as f:
+        json.dump(index, f, indent=2)
+    os.replace(temp_path, path)
+
+# =============================================================================
+# RENDERING
+# =============================================================================
+
+def render_page(task):
+    """Clear and paste rectangles on one atlas page (runs in a worker process).
+
+    Sprites are read through image_sources, which opens its own ZIP handle in
+    every process, so forked workers can read release ZIPs the parent already
+    read from.
+    """
+    page_path, size, rebuild, clears, pastes = task
+    if rebuild or not os.path.exists(page_path):
+        page = Image.new('RGBA', (size, size), (0, 0, 0, 0))
+    else:
+        with Image.open(page_path) as existing:
+            page = existing.convert('RGBA')
+    for x, y, width, height in clears:
+        page.paste((0, 0, 0, 0), (x, y, x + width, y + height))
+    for source, x, y in pastes:
+        try:
+            with open_image(source) as im:
+                sprite = im.convert('RGBA')
+        except Exception as e:
+            raise RuntimeError(f"Could not read {image_name(source)} for {os.path.basename(page_path)}: {e}") from e
+        page.paste((0, 0, 0, 0), (x, y, x + sprite.width, y + sprite.height))
+        page.paste(sprite, (x, y))
+    temp_path = f"{page_path}.tmp.png"
+    page.save(temp_path, 'PNG')
+    os.replace(temp_path, page_path)
+    return page_path
+
+# =============================================================================
+# BUILD
+# =============================================================================
+
+def build_atlas(images, out_dir, version=None, changes=None, full=False,
+                page_size=ATLAS_SIZE, padding=PADDING, workers=ATLAS_WORKERS):
+    """Pack images (paths or image_sources entries) into out_dir, incrementally when an index exists.
+
+    changes: optional changes.json document relative to the existing index;
+    without it, changed items are found by pixel hash.
+    Returns the atlas index.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    sources = {image_name(image): image for image in images}
+    previous = None if full else load_atlas_index(out_dir)
+    if previous and (previous["padding"] != padding or previous["pages"][0]["width"] != page_size):
+        print("Atlas layout settings changed, rebuilding from scratch")
+        previous = None
+
+    if previous:
+        packer = GuillotinePacker(page_size, previous["free"], len(previous["pages"]))
+        placed = dict(previous["images"])
+    else:
+        packer = GuillotinePacker(page_size)
+        placed = {}
+
+    # Decide what to (re)place: everything on a full build, otherwise only changes
+    if changes is not None and previous:
+        removed = [name for name in changes.get("removed", []) if name in placed]
+        dirty = [name for name in changes.get("added", []) + changes.get("modified", []) if name in sources]
+        # Names missing from either side regardless of what changes.json says
+        removed += [name for name in placed if name not in sources and name not in removed]
+        dirty += [name for name in sources if name not in placed and name not in dirty]
+        sprite_info = {}
+        for name in dirty:
+            with open_image(sources[name]) as im:
+                rgba = im.convert('RGBA')
+                sprite_info[name] = (rgba.size, pixel_hash(rgba))
+    else:
+        sprite_info = {}
+        for name, source in sources.items():
+            with open_image(source) as im:
+                rgba = im.convert('RGBA')
+                sprite_info[name] = (rgba.size, pixel_hash(rgba))
+        removed = [name for name in placed if name not in sources]
+        dirty = [name for name in sources if name not in placed or placed[name]["hash"] != sprite_info[name][1]]
+
+    clears = {}   # page -> [(x, y, w, h)]
+    pastes = {}   # page -> [(source, x, y)]
+    for name in removed:
+        entry = placed.pop(name)
+        packer.release(entry["page"], entry["x"] - padding, entry["y"] - padding,
+                       entry["w"] + 2 * padding, entry["h"] + 2 * padding)
+        clears.setdefault(entry["page"], []).append((entry["x"], entry["y"], entry["w"], entry["h"]))
+
+    # Same-size modifications are repainted in place; the rest is (re)packed tallest first
+    to_pack = []
+    for name in dirty:
+        (width, height), digest = sprite_info[name]
+        entry = placed.get(name)
+        if entry and (entry["w"], entry["h"]) == (width, height):
+            entry["hash"] = digest
+            pastes.setdefault(entry["page"], []).append((sources[name], entry["x"], entry["y"]))
+            continue
+        if entry:
+            placed.pop(name)
+            packer.release(entry["page"], entry["x"] - padding, entry["y"] - padding,
+                           entry["w"] + 2 * padding, entry["h"] + 2 * padding)
+            clears.setdefault(entry["page"], []).append((entry["x"], entry["y"], entry["w"], entry["h"]))
+        to_pack.append(name)
+
+    to_pack.sort(key=lambda name: (-sprite_info[name][0][1], -sprite_info[name][0][0], name))
+    for name in to_pack:
+        (width, height), digest = sprite_info[name]
+        page, x, y = packer.insert(width + 2 * padding, height + 2 * padding)
+        placed[name] = {"page": page, "x": x + padding, "y": y + padding, "w": width, "h": height, "hash": digest}
+        pastes.setdefault(page, []).append((sources[name], x + padding, y + padding))
+
+    # Re-render only the pages that changed
+    pages = [{"file": PAGE_FILENAME.format(page), "width": page_size, "height": page_size}
+             for page in range(packer.pages)]
+    touched = sorted(set(clears) | set(pastes))
+    new_pages = range(len(previous["pages"]) if previous else 0, packer.pages)
+    tasks = [(os.path.join(out_dir, pages[page]["file"]), page_size, page in new_pages,
+              clears.get(page, []), pastes.get(page, [])) for page in touched]
+    if tasks:
+        workers = max(1, min(workers, len(tasks)))
+        if workers == 1:
+            list(map(render_page, tasks))
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                list(executor.map(render_page, tasks))
+
+    index = {
+        "version": version,
+        "padding": padding,
+        "pages": pages,
+        "images": dict(sorted(placed.items())),
+        "free": packer.free
+    }
+    save_atlas_index(index, out_dir)
+    print(f"Atlas: {len(placed)} images on {len(pages)} pages, {len(touched)} pages rendered "
+          f"({len(dirty)} placed or repainted, {len(removed)} removed)")
+    return index
+
+# =============================================================================
+# MAIN SCRIPT
+# =============================================================================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pack item images into sprite-sheet atlases with a JSON index.")
+    parser.add_argument("source", help="Gallery images folder (public/images), release ZIP or image folder")
+    parser.add_argument("out_dir", help="Atlas folder; an existing atlas.json there is updated incrementally")
+    parser.add_argument("--version", help="Version to resolve in a gallery images folder (defaults to the newest)")
+    parser.add_argument("--manifest", help="manifest.json listing the images to pack from an image folder")
+    parser.add_argument("--changes", help="changes.json relative to the atlas in out_dir")
+    parser.add_argument("--full", action="store_true", help="Ignore the existing atlas and repack everything")
+    parser.add_argument("--size", type=int, default=ATLAS_SIZE, help="Page width and height")
+    parser.add_argument("--padding", type=int, default=PADDING)
+    parser.add_argument("--workers", type=int, default=ATLAS_WORKERS)
+    args = parser.parse_args(argv)
+
+    version = args.version
+    if version is None and os.path.exists(os.path.join(args.source, "versions.json")):
+        version = GallerySource(args.source).versions[-1]
+    images = iter_manifest(args.source, args.manifest) if args.manifest else iter_source(args.source, version)
+    changes = None
+    if args.changes:
+        with open(args.changes, 'r') as f:
+            changes = json.load(f)
+    build_atlas(images, args.out_dir, version, changes, args.full, args.size, args.padding, args.workers)
+
+if __name__ == "__main__":
+    main(sys.argv[1:])